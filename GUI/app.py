@@ -1,9 +1,43 @@
+import time
+START = time.perf_counter()  # Before any other import, for --profile-startup
+
+import argparse
+import logging
 import tkinter as tk
 from .main_window import MainWindow
+from .startup_profile import StartupProfile
 
 def main():
+    parser = argparse.ArgumentParser(description="Movie Recommendation System")
+    parser.add_argument("--debug", action="store_true", help="log cache hits/misses and other details")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print an import-time and startup phase breakdown")
+    parser.add_argument("--defer-model", action="store_true",
+                        help="load the CNN weights only when the first poster is chosen")
+    parser.add_argument("--metrics", action="store_true",
+                        help="log per-query span timings and print totals on exit")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.WARNING,
+                        format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    metrics = None
+    if args.metrics:
+        from Scripts.metrics import Metrics  # Stdlib only, no heavy imports
+        metrics = Metrics(enabled=True)
+        logging.getLogger("Scripts.metrics").setLevel(logging.INFO)
+
+    profile = StartupProfile(START) if args.profile_startup else None
+    if profile:
+        profile.mark("import GUI (tkinter, PIL)")
+
     root = tk.Tk()  # Create root window
-    app = MainWindow(root)  # Initialize main application window
+    app = MainWindow(root, profile, args.defer_model, metrics)  # Initialize main application window
+    if profile:
+        profile.mark("build main window")
+    root.update()  # Paint the window before any heavy import starts
+    if profile:
+        profile.mark("first paint")
+    app.start_loading()  # Recommender loads in the background
     root.mainloop()  # Start GUI event loop
 
 if __name__ == "__main__":  # Run only if script executed directly
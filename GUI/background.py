@@ -0,0 +1,49 @@
+import logging
+from collections import OrderedDict
+from PIL import Image, ImageTk
+
+logger = logging.getLogger(__name__)
+
+RESIZE_DEBOUNCE_MS = 150  # Quiet time after the last <Configure> before the high-quality pass
+MAX_RENDERS = 8  # High-quality renders kept, one per window size
+
+
+class BackgroundScaler:
+    # Fits the start-page collage to the window. The full-resolution file is decoded
+    # once and reduced to a working copy no larger than the screen. Drags get a
+    # nearest-neighbour preview of that copy (~10x cheaper than bilinear), and
+    # each settled size gets one cached LANCZOS render.
+    def __init__(self, path, screen_size, max_renders=MAX_RENDERS):
+        image = Image.open(path)
+        image.draft("RGB", screen_size)  # Reduced JPEG decoding, never below the screen size
+        image = image.convert("RGB")
+        scale = max(screen_size[0] / image.width, screen_size[1] / image.height)
+        if scale < 1:
+            image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                                 Image.LANCZOS)
+        self.working = image
+        self.max_renders = max_renders
+        self.renders = OrderedDict()  # (width, height) -> PhotoImage, least recently used first
+
+    def cached(self, size):
+        photo = self.renders.get(size)
+        if photo is not None:
+            self.renders.move_to_end(size)
+        return photo
+
+    def preview(self, size):
+        # Cheap render while the window is still being resized; not cached
+        return ImageTk.PhotoImage(self.working.resize(size, Image.NEAREST))
+
+    def render(self, size):
+        # Final LANCZOS render, computed once per size
+        photo = self.cached(size)
+        if photo is not None:
+            logger.debug("background render hit %s", size)
+            return photo
+        logger.debug("background render miss %s", size)
+        photo = ImageTk.PhotoImage(self.working.resize(size, Image.LANCZOS))
+        self.renders[size] = photo
+        if len(self.renders) > self.max_renders:
+            self.renders.popitem(last=False)
+        return photo
@@ -1,15 +1,23 @@
 import tkinter as tk
 from tkinter import ttk, filedialog
 from PIL import Image, ImageTk, ImageDraw
-from Scripts.recommender import ContentBasedRecommender  # Recommender system
 from .tooltip import Tooltip
+from .worker import BackgroundWorker  # Off-thread recommender calls
+from .thumbnails import ThumbnailCache  # Cached poster thumbnails
+from .background import BackgroundScaler, RESIZE_DEBOUNCE_MS  # Cached background renders
 import os
+import time
 
 class MainWindow:
-    def __init__(self, root):
+    def __init__(self, root, profile=None, defer_model=False, metrics=None):
         self.root = root  # Root window
         self.bg_color = "#1A1A2E"  # Background color
-        self.recommender = ContentBasedRecommender()  # Initialize recommender
+        self.recommender = None  # Loaded in the background, see start_loading
+        self.profile = profile  # StartupProfile with --profile-startup
+        self.defer_model = defer_model  # Load the CNN weights on the first poster only
+        self.metrics = metrics  # Scripts.metrics.Metrics with --metrics
+        self.worker = BackgroundWorker(self.root)  # Keeps slow calls off the Tk main loop
+        self.thumbnails = ThumbnailCache()  # LRU of PhotoImages + pre-rendered files on disk
         
         # Root window config
         self.root.title(" Movie Recommendation System")  # Window title
@@ -31,14 +39,13 @@ class MainWindow:
         self.start_page = tk.Frame(self.container, bg=self.bg_color)
         self.start_page.grid(row=0, column=0, sticky="nsew")
         
-        # Load background image
-        self.original_bg_image = Image.open("Assets/background.jpg")
-        
-        # Resize background to screen
+        # Load background image, reduced once to a screen-sized working copy
         screen_width = self.root.winfo_screenwidth()
         screen_height = self.root.winfo_screenheight()
-        resized = self.original_bg_image.resize((screen_width, screen_height), Image.LANCZOS)
-        self.bg_photo = ImageTk.PhotoImage(resized)
+        self.background = BackgroundScaler("Assets/background.jpg", (screen_width, screen_height))
+        self.bg_size = (screen_width, screen_height)  # Size currently shown
+        self.bg_resize_job = None  # Pending high-quality pass
+        self.bg_photo = self.background.render(self.bg_size)
         
         # Background label
         self.bg_label = tk.Label(self.start_page, image=self.bg_photo)
@@ -61,6 +68,35 @@ class MainWindow:
         # Show start page first
         self.start_page.tkraise()
 
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def start_loading(self):
+        # Called once the window has painted: features, text model and (unless deferred) the CNN
+        self.worker.submit("load", self.load_recommender,
+                           on_done=self.on_recommender_ready, on_error=self.on_recommender_ready)
+
+    def load_recommender(self):
+        # Worker thread: the heavy imports happen here, never before the first paint
+        if self.profile:
+            self.profile.time_imports(["numpy", "pandas", "scipy.sparse"])
+        start = time.perf_counter()
+        from Scripts.recommender import ContentBasedRecommender  # Recommender system
+        if self.profile:
+            self.profile.add("import Scripts.recommender", time.perf_counter() - start)
+        recommender = ContentBasedRecommender(lazy_model=True, metrics=self.metrics)  # ResNet50 comes later, see load_model
+        if self.profile:
+            for phase, seconds in recommender.startup_timings.items():
+                self.profile.add(f"recommender: {phase}", seconds)
+        return recommender
+
+    def load_model(self):
+        # Worker thread: torch import and ResNet50 weights
+        if self.profile:
+            self.profile.time_imports(["torch", "torchvision"])
+        self.recommender.load_model()
+        if self.profile:
+            self.profile.add("recommender: model weights", self.recommender.startup_timings["model"])
+
     def create_rounded_rectangle(self, width, height, radius, fill_color, border_color=None, border_width=0):
         # Create rounded rectangle image
         image = Image.new('RGBA', (width, height), (0, 0, 0, 0))
@@ -137,17 +173,56 @@ class MainWindow:
             width=25
         )
         self.select_button.pack(pady=20, ipady=8)
+        self.select_button.state(["disabled"])  # Enabled once the recommender is loaded
+        
+        # Loading progress
+        self.load_progress = ttk.Progressbar(self.inner_frame_modern, mode="indeterminate", length=260)
+        self.load_progress.pack(pady=(0, 5))
+        self.load_progress.start(12)
         
         # Info label
         self.info_label = tk.Label(
             self.inner_frame_modern,
-            text="Supported formats: JPG, PNG, BMP, GIF",
+            text="⏳ Loading recognition model...",
             font=("Segoe UI", 10),
             foreground="#999999",
             background="#FFFFFF"
         )
         self.info_label.pack(pady=(10, 0))
 
+    def on_recommender_ready(self, recommender):
+        # Called on the Tk thread when background loading finishes (or fails)
+        self.load_progress.stop()
+        self.load_progress.pack_forget()
+        if isinstance(recommender, Exception):
+            self.info_label.config(text=f"❌ Could not load the recommender: {recommender}", foreground="#DC3545")
+            return
+        self.recommender = recommender
+        self.select_button.state(["!disabled"])
+        self.info_label.config(text="Supported formats: JPG, PNG, BMP, GIF")
+        if self.profile:
+            self.profile.mark("recommender ready")
+        if self.defer_model:
+            if self.profile:
+                self.profile.report("model weights deferred to the first poster")
+            return
+        # Warm up the CNN while the user picks a file; a query queued meanwhile waits for it
+        self.worker.submit("model", self.load_model, on_done=self.on_model_ready, on_error=self.on_model_ready)
+
+    def on_model_ready(self, result):
+        if isinstance(result, Exception):
+            self.info_label.config(text=f"❌ Could not load the recognition model: {result}", foreground="#DC3545")
+            return
+        if self.profile:
+            self.profile.mark("model ready")
+            self.profile.report("window, recommender and model")
+
+    def on_close(self):
+        self.worker.shutdown()  # Drop queued work, don't wait for a running query
+        if self.metrics:
+            print(self.metrics.to_json())  # Span timings of this session
+        self.root.destroy()
+
     def setup_modern_styles(self):
         style = ttk.Style()
         # Entry style
@@ -165,13 +240,28 @@ class MainWindow:
                   relief=[('pressed', 'flat'), ('!pressed', 'flat')])
 
     def resize_background(self, event):
-        # Resize background on window resize
-        if event.widget == self.start_page:
-            new_width = event.width
-            new_height = event.height
-            resized = self.original_bg_image.resize((new_width, new_height), Image.LANCZOS)
-            self.bg_photo = ImageTk.PhotoImage(resized)
-            self.bg_label.config(image=self.bg_photo)
+        # Resize background on window resize: fast preview now, LANCZOS once the drag settles
+        if event.widget != self.start_page or event.width < 2 or event.height < 2:
+            return
+        size = (event.width, event.height)
+        if size == self.bg_size:
+            return
+        self.bg_size = size
+        if self.bg_resize_job is not None:
+            self.root.after_cancel(self.bg_resize_job)
+            self.bg_resize_job = None
+
+        photo = self.background.cached(size)  # Size seen before: no resampling at all
+        if photo is None:
+            photo = self.background.preview(size)
+            self.bg_resize_job = self.root.after(RESIZE_DEBOUNCE_MS, self.finish_background_resize)
+        self.bg_photo = photo
+        self.bg_label.config(image=self.bg_photo)
+
+    def finish_background_resize(self):
+        self.bg_resize_job = None
+        self.bg_photo = self.background.render(self.bg_size)
+        self.bg_label.config(image=self.bg_photo)
 
     def setup_style(self):
         # General style config
@@ -200,14 +290,44 @@ class MainWindow:
     def display_info(self, path):
         # Show movie info page
         self.result_page.tkraise()
+        self.clear_result_page()
+        
+        # Searching state while the query runs in the background
+        ttk.Label(self.inner_frame, text="🔎 Analyzing poster...", font=("Helvetica", 14),
+                  foreground="#CCCCCC", background=self.bg_color).pack(pady=10)
+        progress = ttk.Progressbar(self.inner_frame, mode="indeterminate", length=300)
+        progress.pack(pady=5)
+        progress.start(12)
+        
+        # A newer selection replaces this query; its result is then discarded
+        self.worker.submit("query", self.run_query, path,
+                           on_done=lambda outcome: self.show_results(path, outcome),
+                           on_error=lambda error: self.show_results(path, error))
+
+    def run_query(self, path):
+        # Worker thread: recognition and recommendations, no Tk calls here
+        best_id, result = self.recommender.find_best_match(path)
+        if result is None:
+            return best_id, result, None
+        return best_id, result, self.recommender.recommend(best_id, top_n=5, alpha=0.6)
+
+    def clear_result_page(self):
         for widget in self.inner_frame.winfo_children():
             widget.destroy()
         
         # Choose button at top
         ttk.Button(self.inner_frame, text="📁 Choose a Poster",
                    command=self.on_select_poster, width=25, style="Success2.TButton").pack(pady=10)
+
+    def show_results(self, path, outcome):
+        # Tk thread: render the finished query
+        self.clear_result_page()
+        if isinstance(outcome, Exception):
+            ttk.Label(self.inner_frame, text=f"❌ Error: {outcome}", font=("Helvetica", 14),
+                      foreground="#FFA500", background=self.bg_color).pack(pady=10)
+            return
         
-        best_id, result = self.recommender.find_best_match(path)
+        best_id, result, similar_movies = outcome
         if result is None:
             ttk.Label(self.inner_frame, text="❌ No match found.", font=("Helvetica", 14),
                       foreground="#FFA500", background=self.bg_color).pack(pady=10)
@@ -218,8 +338,7 @@ class MainWindow:
         main_frame.pack(fill="x", pady=10, anchor="center")
         
         # Poster
-        img = Image.open(path).resize((200, 300))
-        photo = ImageTk.PhotoImage(img)
+        photo = self.thumbnails.photo(path, (200, 300))
         img_label = ttk.Label(main_frame, image=photo, style="Custom.TLabel")
         img_label.image = photo
         img_label.grid(row=0, column=0, rowspan=6, padx=10)
@@ -263,8 +382,6 @@ class MainWindow:
         ttk.Label(self.inner_frame, text="🎞️ Recommended similar movies:", font=("Helvetica", 18, "bold"),
                   foreground="#FFD369", background=self.bg_color).pack(anchor="w", padx=10, pady=(0, 15))
         
-        similar_movies = self.recommender.recommend(best_id, top_n=5, alpha=0.6)
-        
         rec_frame = ttk.Frame(self.inner_frame, style="Custom.TFrame")
         rec_frame.pack(padx=10, anchor="w")
         
@@ -279,8 +396,7 @@ class MainWindow:
             
             sim_path = sim_row['poster_path']
             if os.path.exists(sim_path):
-                sim_img = Image.open(sim_path).resize((150, 220))
-                sim_photo = ImageTk.PhotoImage(sim_img)
+                sim_photo = self.thumbnails.photo(sim_path, (150, 220))
                 sim_label = tk.Label(container, image=sim_photo, bg="#2A2A40")
                 sim_label.image = sim_photo
                 sim_label.pack(pady=(0, 5))
@@ -314,8 +430,7 @@ class MainWindow:
         
         # Poster
         if os.path.exists(movie['poster_path']):
-            img = Image.open(movie['poster_path']).resize((180, 280))
-            photo = ImageTk.PhotoImage(img)
+            photo = self.thumbnails.photo(movie['poster_path'], (180, 280))
             img_label = tk.Label(detail_win, image=photo, bg=self.bg_color)
             img_label.image = photo
             img_label.pack(pady=10)
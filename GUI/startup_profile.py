@@ -0,0 +1,43 @@
+import sys
+import time
+import threading
+import importlib
+
+
+class StartupProfile:
+    # Wall-clock breakdown of a GUI start, printed by `python -m GUI.app --profile-startup`.
+    # Tk-thread phases are marked in sequence; imports and recommender phases run on the
+    # worker thread and are added with their own durations.
+    def __init__(self, start):
+        self.start = start  # perf_counter() taken before the first import
+        self.last = start
+        self.phases = []  # (phase, seconds, seconds since start)
+        self.lock = threading.Lock()
+
+    def mark(self, phase):
+        # Time since the previous mark
+        now = time.perf_counter()
+        with self.lock:
+            self.phases.append((phase, now - self.last, now - self.start))
+        self.last = now
+
+    def add(self, phase, seconds):
+        # A phase measured elsewhere, ending now
+        with self.lock:
+            self.phases.append((phase, seconds, time.perf_counter() - self.start))
+
+    def time_imports(self, modules):
+        # Import each module once, timing the ones not loaded yet
+        for name in modules:
+            if name in sys.modules:
+                continue
+            start = time.perf_counter()
+            importlib.import_module(name)
+            self.add(f"import {name}", time.perf_counter() - start)
+
+    def report(self, title):
+        with self.lock:
+            phases = list(self.phases)
+        print(f"⏱️ Startup profile: {title}")
+        for phase, seconds, at in phases:
+            print(f"   {phase:<36} {seconds * 1000:9.1f} ms   (at {at:6.2f}s)")
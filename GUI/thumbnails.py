@@ -0,0 +1,96 @@
+import os
+import logging
+import argparse
+from collections import OrderedDict
+from PIL import Image, ImageTk
+
+logger = logging.getLogger(__name__)
+
+POSTER_DIR = "Data/Posters"  # Catalogue posters, thumbnails are kept on disk for these
+THUMB_DIR = "Data/Thumbnails"  # One sub-folder per size, e.g. Data/Thumbnails/150x220
+SIZES = [(150, 220), (180, 280), (200, 300)]  # Recommendation card, detail window, query poster
+MAX_PHOTOS = 256  # PhotoImages kept in memory
+
+
+def render_thumbnail(path, size):
+    # Reduced JPEG decoding: draft() lets libjpeg decode at 1/2, 1/4 or 1/8 scale
+    image = Image.open(path)
+    image.draft("RGB", size)
+    return image.convert("RGB").resize(size)
+
+
+class ThumbnailCache:
+    def __init__(self, poster_dir=POSTER_DIR, thumb_dir=THUMB_DIR, max_photos=MAX_PHOTOS):
+        self.poster_dir = os.path.abspath(poster_dir)
+        self.thumb_dir = thumb_dir
+        self.max_photos = max_photos
+        self.photos = OrderedDict()  # (path, size, mtime) -> PhotoImage, least recently used first
+        self.hits = self.disk_hits = self.misses = 0
+
+    def disk_path(self, path, size):
+        # Only catalogue posters get a pre-rendered file; uploads stay in memory
+        path = os.path.abspath(path)
+        if os.path.dirname(path) != self.poster_dir:
+            return None
+        name = os.path.splitext(os.path.basename(path))[0] + ".jpg"
+        return os.path.join(self.thumb_dir, f"{size[0]}x{size[1]}", name)
+
+    def image(self, path, size):
+        # PIL thumbnail from the disk tier, rendered and stored there on a miss
+        thumb_path = self.disk_path(path, size)
+        if thumb_path and os.path.exists(thumb_path) and os.path.getmtime(thumb_path) >= os.path.getmtime(path):
+            self.disk_hits += 1
+            logger.debug("thumbnail disk hit %s %s", size, path)
+            return Image.open(thumb_path)
+
+        self.misses += 1
+        logger.debug("thumbnail miss %s %s", size, path)
+        image = render_thumbnail(path, size)
+        if thumb_path:
+            os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+            image.save(thumb_path, quality=90)
+        return image
+
+    def photo(self, path, size):
+        # Tk PhotoImage, shared by every widget that shows this poster at this size
+        size = tuple(size)
+        key = (os.path.abspath(path), size, os.path.getmtime(path))
+        photo = self.photos.get(key)
+        if photo is not None:
+            self.photos.move_to_end(key)
+            self.hits += 1
+            logger.debug("thumbnail memory hit %s %s", size, path)
+            return photo
+
+        photo = ImageTk.PhotoImage(self.image(path, size))
+        self.photos[key] = photo
+        if len(self.photos) > self.max_photos:
+            self.photos.popitem(last=False)  # Widgets still showing it keep their own reference
+        return photo
+
+    def stats(self):
+        return {"memory_hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                "cached_photos": len(self.photos)}
+
+
+def prerender(poster_dir=POSTER_DIR, thumb_dir=THUMB_DIR, sizes=SIZES):
+    # Fill the disk tier for every catalogue poster, skipping up-to-date files
+    cache = ThumbnailCache(poster_dir, thumb_dir)
+    names = sorted(f for f in os.listdir(poster_dir) if f.lower().endswith((".jpg", ".jpeg", ".png")))
+    for i, name in enumerate(names):
+        for size in sizes:
+            try:
+                cache.image(os.path.join(poster_dir, name), size)
+            except Exception as e:
+                print(f"⚠️ Error with {name}: {e}")
+        if i % 100 == 0:
+            print(f"✅ Processed {i + 1}/{len(names)}")
+    print(f"🖼️ Thumbnails ready in {thumb_dir}: {cache.misses} rendered, {cache.disk_hits} up to date")
+
+
+if __name__ == "__main__":  # python -m GUI.thumbnails
+    parser = argparse.ArgumentParser(description="Pre-render poster thumbnails for the GUI")
+    parser.add_argument("--poster-dir", default=POSTER_DIR)
+    parser.add_argument("--thumb-dir", default=THUMB_DIR)
+    args = parser.parse_args()
+    prerender(args.poster_dir, args.thumb_dir)
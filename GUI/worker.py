@@ -0,0 +1,61 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BackgroundWorker:
+    # Runs slow calls (model loading, recognition) off the Tk main loop and
+    # delivers their results back on the Tk thread through root.after polling.
+    def __init__(self, root, poll_ms=30):
+        self.root = root  # Tk root, owns the polling loop
+        self.poll_ms = poll_ms  # How often finished tasks are collected
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recommender")  # Serialized calls
+        self.results = queue.Queue()  # Finished tasks waiting for the Tk thread
+        self.generations = {}  # Latest task per key; older results are stale
+        self.futures = {}  # Pending future per key, cancelled when superseded
+        self.closed = False
+        self.root.after(self.poll_ms, self._poll)
+
+    def submit(self, key, fn, *args, on_done=None, on_error=None):
+        # A new task for the same key makes any earlier one stale
+        generation = self.generations.get(key, 0) + 1
+        self.generations[key] = generation
+        previous = self.futures.get(key)
+        if previous is not None:
+            previous.cancel()  # Not started yet: never runs
+
+        def task():
+            try:
+                self.results.put((key, generation, on_done, fn(*args), None))
+            except Exception as e:
+                self.results.put((key, generation, on_error, None, e))
+
+        self.futures[key] = self.executor.submit(task)
+        return generation
+
+    def cancel(self, key):
+        self.generations[key] = self.generations.get(key, 0) + 1
+        future = self.futures.pop(key, None)
+        if future is not None:
+            future.cancel()
+
+    def _poll(self):
+        # Runs on the Tk thread: hand finished results to their callbacks
+        while True:
+            try:
+                key, generation, callback, result, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self.generations.get(key):
+                continue  # Superseded by a newer request
+            self.futures.pop(key, None)
+            if callback is None:
+                if error is not None:
+                    print(f"⚠️ Background task '{key}' failed: {error}")
+                continue
+            callback(error if error is not None else result)
+        if not self.closed:
+            self.root.after(self.poll_ms, self._poll)
+
+    def shutdown(self):
+        self.closed = True
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,191 @@
+import os  # File system
+import time  # Benchmark timing
+import argparse  # Command line
+import numpy as np  # Numeric operations
+from .embedding_store import EmbeddingStore, normalize_rows, default_store_path
+
+# Inverted-file (IVF) index over the unit-length poster embeddings.
+# Vectors are clustered with spherical k-means; a query only scans the
+# lists of its `nprobe` closest centroids instead of the whole catalogue.
+
+default_index_path = "features.ivf.npz"
+default_metadata_path = "Data/metadata.csv"
+DEFAULT_NPROBE = 8  # Lists scanned per query: higher = better recall, slower
+BLOCK_ROWS = 16384  # Rows assigned per block while building
+
+
+def top_k_rows(sims, top_k):
+    # Sorted top-k of every row of a (q, n) similarity block
+    k = min(top_k, sims.shape[1])
+    top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    top_sims = np.take_along_axis(sims, top, axis=1)
+    order = np.argsort(-top_sims, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_sims, order, axis=1)
+
+
+class ExactIndex:
+    # Brute-force cosine search: one matrix product against every row
+    def __init__(self, features):
+        self.features = features
+
+    def search(self, queries, top_k=5):
+        return top_k_rows(queries @ self.features.T, top_k)
+
+
+def assign(features, centroids):
+    # Closest centroid of every row, in blocks to bound memory
+    labels = np.empty(len(features), dtype=np.int64)
+    for start in range(0, len(features), BLOCK_ROWS):
+        block = np.asarray(features[start:start + BLOCK_ROWS], dtype=np.float32)
+        labels[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def spherical_kmeans(features, n_lists, n_iter=20, seed=0, sample_per_list=256):
+    # Train on a sample, like most IVF builders; centroids stay unit length
+    rng = np.random.default_rng(seed)
+    n_sample = min(len(features), n_lists * sample_per_list)
+    sample = np.asarray(features[np.sort(rng.choice(len(features), n_sample, replace=False))],
+                        dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+
+    for _ in range(n_iter):
+        labels = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=n_lists)
+        empty = counts == 0
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]  # Re-seed empty lists
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class IVFIndex:
+    def __init__(self, features, centroids, offsets, rows, nprobe=DEFAULT_NPROBE):
+        self.features = features  # Unit-length store rows
+        self.centroids = centroids  # (lists, d)
+        self.offsets = offsets  # List l holds rows[offsets[l]:offsets[l + 1]]
+        self.rows = rows
+        self.nprobe = nprobe
+
+    @classmethod
+    def build(cls, features, n_lists=None, n_iter=20, seed=0, nprobe=DEFAULT_NPROBE):
+        if n_lists is None:
+            n_lists = max(1, int(round(np.sqrt(len(features)))))
+        n_lists = min(n_lists, len(features))
+        centroids = spherical_kmeans(features, n_lists, n_iter, seed)
+        labels = assign(features, centroids)
+        rows = np.argsort(labels, kind="stable")  # Rows grouped by list, ascending inside each list
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=n_lists))])
+        return cls(features, centroids, offsets, rows, nprobe)
+
+    def save(self, path, fingerprint):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as fh:
+            np.savez(fh, centroids=self.centroids, offsets=self.offsets, rows=self.rows,
+                     fingerprint=np.array(fingerprint))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, features, fingerprint, nprobe=DEFAULT_NPROBE):
+        # None if the index is missing or was built for another version of the store
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            if str(data["fingerprint"]) != fingerprint:
+                return None
+            return cls(features, data["centroids"], data["offsets"], data["rows"], nprobe)
+
+    def search(self, queries, top_k=5, nprobe=None):
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        probes, _ = top_k_rows(queries @ self.centroids.T, nprobe)
+
+        rows = np.zeros((len(queries), top_k), dtype=np.int64)
+        scores = np.full((len(queries), top_k), -np.inf, dtype=np.float32)
+        for q, (query, lists) in enumerate(zip(queries, probes)):
+            candidates = np.concatenate([self.rows[self.offsets[l]:self.offsets[l + 1]] for l in lists])
+            if len(candidates) < top_k:  # Probed lists too small: fall back to exact
+                candidates = np.arange(len(self.features))
+            candidates.sort()  # Sequential reads from the memory map
+            top, top_sims = top_k_rows((self.features[candidates] @ query)[None, :], top_k)
+            rows[q, :top.shape[1]] = candidates[top[0]]
+            scores[q, :top.shape[1]] = top_sims[0]
+        return rows, scores
+
+
+def load_index(store, features, mode="auto", index_path=default_index_path, nprobe=DEFAULT_NPROBE,
+               compressed_path=None):
+    # "exact" always scans; "ivf"/"compressed" require a fresh index file;
+    # "auto" prefers IVF, then compressed codes, then the exact scan
+    from .compressed_index import CompressedIndex, default_compressed_path  # Avoid a circular import
+    compressed_path = compressed_path or default_compressed_path
+
+    if mode == "exact":
+        return ExactIndex(features)
+    if mode in ("auto", "ivf"):
+        index = IVFIndex.load(index_path, features, store.fingerprint, nprobe)
+        if index is not None:
+            return index
+        if mode == "ivf":
+            raise ValueError(f"{index_path} is missing or stale; rebuild it with "
+                             f"'python -m Scripts.ann_index build'")
+    if mode in ("auto", "compressed"):
+        index = CompressedIndex.load(compressed_path, features, store.fingerprint)
+        if index is not None:
+            return index
+        if mode == "compressed":
+            raise ValueError(f"{compressed_path} is missing or stale; rebuild it with "
+                             f"'python -m Scripts.compressed_index build'")
+    if mode not in ("auto", "ivf", "compressed"):
+        raise ValueError(f"Unknown search mode '{mode}'")
+    return ExactIndex(features)
+
+
+def benchmark(store, index, queries, top_k=1, nprobes=(1, 2, 4, 8, 16, 32)):
+    # Recall@1 of IVF against exact cosine search for the same queries
+    features = store.features
+
+    exact = ExactIndex(features)
+    start = time.perf_counter()
+    truth, _ = exact.search(queries, top_k)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    print(f"📏 exact: {exact_ms:.3f} ms/query over {len(features)} vectors")
+
+    for nprobe in nprobes:
+        start = time.perf_counter()
+        found, _ = index.search(queries, top_k, nprobe)
+        ivf_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = float(np.mean(found[:, 0] == truth[:, 0]))
+        print(f"⚡ nprobe={nprobe:<3d} recall@1={recall:.3f}  {ivf_ms:.3f} ms/query "
+              f"({exact_ms / ivf_ms if ivf_ms else 0:.1f}x)")
+
+
+if __name__ == "__main__":  # python -m Scripts.ann_index build|bench
+    parser = argparse.ArgumentParser(description="Build or benchmark the IVF poster index")
+    parser.add_argument("command", choices=["build", "bench"])
+    parser.add_argument("--store", default=default_store_path, help="embedding store")
+    parser.add_argument("--index", default=default_index_path, help="index file")
+    parser.add_argument("--lists", type=int, default=None, help="number of inverted lists (default sqrt(N))")
+    parser.add_argument("--iters", type=int, default=20, help="k-means iterations")
+    parser.add_argument("--metadata", default=default_metadata_path, help="posters for the benchmark queries")
+    parser.add_argument("--queries", type=int, default=100, help="benchmark posters, each in every perturbation")
+    parser.add_argument("--synthetic", action="store_true", help="query with noisy store vectors instead of posters")
+    parser.add_argument("--noise", type=float, default=0.05, help="perturbation of the synthetic queries")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32], help="nprobe values to test")
+    args = parser.parse_args()
+
+    store = EmbeddingStore(args.store)
+    if args.command == "build":
+        start = time.perf_counter()
+        index = IVFIndex.build(store.features, args.lists, args.iters)
+        index.save(args.index, store.fingerprint)
+        print(f"✅ IVF index with {len(index.centroids)} lists saved to {args.index} "
+              f"({time.perf_counter() - start:.1f}s)")
+    else:
+        index = IVFIndex.load(args.index, store.features, store.fingerprint)
+        if index is None:
+            print(f"⚠️ {args.index} missing or stale, building a temporary index...")
+            index = IVFIndex.build(store.features, args.lists, args.iters)
+        from .benchmark import index_queries  # Imports the recommender, so only for bench
+        queries = index_queries(store, args.metadata, args.queries, args.noise, synthetic=args.synthetic)
+        benchmark(store, index, queries, nprobes=args.nprobe)
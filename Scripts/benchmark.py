@@ -0,0 +1,338 @@
+import io  # In-memory JPEG round trips
+import os  # File system
+import sys  # Interpreter for the startup probe
+import json  # Results format
+import time  # Latency
+import random  # Query sampling
+import argparse  # Command line
+import platform  # Environment record
+import tempfile  # Synthetic catalogues
+import subprocess  # Cold-process startup probe
+import numpy as np  # Numeric operations
+import pandas as pd  # Metadata
+from PIL import Image  # Perturbed posters
+from .embedding_store import EmbeddingStore, write_store, normalize_rows, default_store_path
+from .embedding_engine import engine_for  # CNN of a given store
+from .ann_index import IVFIndex  # Optional ANN index for the synthetic store
+from .compressed_index import CompressedIndex  # Optional compressed index
+from .recommender import ContentBasedRecommender, default_metadata_path
+
+try:
+    import resource  # Peak RSS; not available on Windows
+except ImportError:
+    resource = None
+
+# Benchmark harness for the recognize / recommend hot paths.
+#
+# For every catalogue size the real movies (metadata.csv + features.emb) are
+# padded with synthetic distractors: copies of real metadata rows under new
+# ids and random non-negative unit embeddings, written to a scratch folder
+# together with their caches. The suite then measures, in one JSON file:
+#   - extraction throughput (decode + CNN) at several batch sizes
+#   - per-query embedding latency, search latency and recall@1/@5 for
+#     perturbed copies of real posters (crop, JPEG, resize, all three)
+#   - end-to-end find_best_match and recommend latency
+#   - constructor time (cold caches and a warm fresh process) and peak RSS
+#
+#   python -m Scripts.benchmark --sizes 1000 10000 100000 --output bench.json
+
+DEFAULT_SIZES = [1000, 10000]
+DEFAULT_OUTPUT = "benchmark_results.json"
+PERTURBATIONS = ["original", "crop", "jpeg", "resize", "combined"]
+BATCH_SIZES = [1, 8, 32]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10  # bytes on macOS, KiB on Linux
+
+
+def latency_stats(seconds):
+    ms = np.asarray(seconds) * 1000
+    if len(ms) == 0:
+        return {}
+    return {"n": int(len(ms)), "mean_ms": float(ms.mean()), "p50_ms": float(np.percentile(ms, 50)),
+            "p95_ms": float(np.percentile(ms, 95)), "max_ms": float(ms.max())}
+
+
+def jpeg(image, quality):
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    buffer.seek(0)
+    return Image.open(buffer).convert("RGB")
+
+
+def perturb(image, kind, rng):
+    # Copies like a photo or a re-encoded download of the poster (cf. Examples/InceptionAlternative.jpg)
+    image = image.convert("RGB")
+    if kind in ("crop", "combined"):
+        w, h = image.size
+        keep = rng.uniform(0.8, 0.9)
+        cw, ch = int(w * keep), int(h * keep)
+        x, y = rng.randint(0, w - cw), rng.randint(0, h - ch)
+        image = image.crop((x, y, x + cw, y + ch))
+    if kind in ("resize", "combined"):
+        scale = 0.5 if kind == "resize" else 0.6
+        image = image.resize((max(1, int(image.width * scale)), max(1, int(image.height * scale))), Image.BILINEAR)
+    if kind in ("jpeg", "combined"):
+        image = jpeg(image, 30 if kind == "jpeg" else 40)
+    return image
+
+
+def make_queries(metadata, store, workdir, n_queries, seed):
+    # {kind: [(movie id, path)]} for real movies that have a poster and a stored vector
+    rng = random.Random(seed)
+    present = [(int(movie_id), path) for movie_id, path in zip(metadata["id"], metadata["poster_path"])
+               if movie_id in store and os.path.exists(path)]
+    picks = rng.sample(present, min(n_queries, len(present)))
+    queries = {kind: [] for kind in PERTURBATIONS}
+    for movie_id, path in picks:
+        with Image.open(path) as original:
+            for kind in PERTURBATIONS:
+                out = os.path.join(workdir, "queries", kind, f"{movie_id}.jpg")
+                os.makedirs(os.path.dirname(out), exist_ok=True)
+                perturb(original, kind, rng).save(out, quality=95)
+                queries[kind].append((movie_id, out))
+    return queries
+
+
+def poster_query_vectors(store, metadata_path=default_metadata_path, n_queries=100, seed=0, batch_size=16):
+    # Perturbed copies of real posters (every variant) embedded by the store's CNN, unit length
+    metadata = pd.read_csv(metadata_path, usecols=["id", "poster_path"])
+    engine = engine_for(store.model_id)
+    vectors = []
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = [path for items in make_queries(metadata, store, workdir, n_queries, seed).values()
+                 for _, path in items]
+        for start in range(0, len(paths), batch_size):
+            images = [Image.open(path).convert("RGB") for path in paths[start:start + batch_size]]
+            vectors.append(engine.embed(images))
+    if not vectors:
+        raise ValueError(f"No posters with a stored vector in {metadata_path}")
+    return normalize_rows(np.concatenate(vectors))
+
+
+def noisy_query_vectors(store, n_queries=500, noise=0.05, seed=0):
+    # Stored vectors plus Gaussian noise; needs neither posters nor CNN weights
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(store.features), min(n_queries, len(store.features)), replace=False)
+    queries = np.asarray(store.features[picks], dtype=np.float32)
+    return normalize_rows(queries + rng.normal(0, noise, queries.shape).astype(np.float32) / np.sqrt(store.dim))
+
+
+def index_queries(store, metadata_path=default_metadata_path, n_queries=100, noise=0.05, seed=0, synthetic=False):
+    # Queries for the index benchmarks: real posters, or noisy store vectors when those cannot be embedded
+    if not synthetic:
+        try:
+            queries = poster_query_vectors(store, metadata_path, n_queries, seed)
+            print(f"🧪 {len(queries)} queries: {n_queries} real posters x {len(PERTURBATIONS)} variants through the CNN")
+            return queries
+        except Exception as e:  # No posters, no weights, or a store from an unknown model
+            print(f"⚠️ Real poster queries unavailable ({e}), using noisy store vectors")
+    print(f"🧪 {min(n_queries, len(store.features))} synthetic queries (stored vectors + noise {noise})")
+    return noisy_query_vectors(store, n_queries, noise, seed)
+
+
+def real_movies(metadata, store, size):
+    # The real movies a catalogue of `size` starts with
+    return metadata[[movie_id in store for movie_id in metadata["id"]]].head(size)
+
+
+def build_catalogue(metadata, store, size, workdir, seed, search_mode):
+    # Real movies first, then synthetic rows up to `size`; returns constructor kwargs
+    rng = np.random.default_rng(seed)
+    real = real_movies(metadata, store, size)
+    extra = size - len(real)
+    ids = real["id"].to_numpy(dtype=np.int64)
+    features = normalize_rows(np.asarray(store.features[store.rows_of(ids)], dtype=np.float32))
+    if extra > 0:
+        synthetic = real.iloc[rng.integers(0, len(real), extra)].copy()
+        synthetic["id"] = int(metadata["id"].max()) + 1 + np.arange(extra)
+        real = pd.concat([real, synthetic], ignore_index=True)
+        blocks = [features]
+        for start in range(0, extra, 8192):  # Non-negative like post-ReLU CNN features
+            block = np.abs(rng.standard_normal((min(8192, extra - start), store.dim))).astype(np.float32)
+            blocks.append(normalize_rows(block))
+        features = np.concatenate(blocks)
+        ids = real["id"].to_numpy(dtype=np.int64)
+
+    folder = os.path.join(workdir, f"catalogue_{size}")
+    os.makedirs(folder, exist_ok=True)
+    paths = {"metadata_path": os.path.join(folder, "metadata.csv"),
+             "store_path": os.path.join(folder, "features.emb"),
+             "index_path": os.path.join(folder, "features.ivf.npz"),
+             "compressed_path": os.path.join(folder, "features.compressed.npz"),
+             "search_mode": search_mode}
+    real.to_csv(paths["metadata_path"], index=False)
+    write_store(paths["store_path"], ids, features, store.header["model_id"])
+    del features
+
+    catalogue = EmbeddingStore(paths["store_path"])
+    if search_mode == "ivf":
+        IVFIndex.build(catalogue.features).save(paths["index_path"], catalogue.fingerprint)
+    elif search_mode == "compressed":
+        CompressedIndex.build(catalogue.features).save(paths["compressed_path"], catalogue.fingerprint)
+    return paths
+
+
+def probe_startup(paths):
+    # Constructor in a fresh interpreter with warm caches: wall time, phases and peak RSS
+    code = ("import json, time\n"
+            "start = time.perf_counter()\n"
+            "from Scripts.recommender import ContentBasedRecommender\n"
+            "from Scripts.benchmark import peak_rss_mb\n"
+            f"recommender = ContentBasedRecommender(**{paths!r})\n"
+            "print(json.dumps({'seconds': time.perf_counter() - start, 'phases': recommender.startup_timings,"
+            " 'peak_rss_mb': peak_rss_mb()}))\n")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def bench_extraction(recommender, metadata, n_images, batch_sizes):
+    # Decode + CNN throughput over real posters
+    paths = [path for path in metadata["poster_path"] if os.path.exists(path)][:n_images]
+    results = []
+    if not paths:
+        return results
+    recommender.extract_visual_features_batch(paths[:1])  # Warm-up: weights, allocator
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        for i in range(0, len(paths), batch_size):
+            recommender.extract_visual_features_batch(paths[i:i + batch_size])
+        elapsed = time.perf_counter() - start
+        results.append({"batch_size": batch_size, "images": len(paths), "images_per_s": len(paths) / elapsed})
+        print(f"⚡ extraction batch={batch_size:<3d} {len(paths) / elapsed:.1f} images/s")
+    return results
+
+
+def embed_queries(recommender, queries):
+    # Per-query decode + CNN time, and the query vectors reused for every catalogue size
+    embedded, latencies = {}, []
+    for kind, items in queries.items():
+        vectors = []
+        for _, path in items:
+            start = time.perf_counter()
+            vectors.append(recommender.extract_visual_features(path))
+            latencies.append(time.perf_counter() - start)
+        embedded[kind] = np.stack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+    return embedded, latency_stats(latencies)
+
+
+def bench_catalogue(recommender, queries, embedded, n_end_to_end, n_recommend, seed):
+    results = {"recognition": {}}
+    for kind, items in queries.items():
+        truth = np.array([movie_id for movie_id, _ in items])
+        missing = [movie_id for movie_id in truth if movie_id not in recommender.store]
+        assert not missing, f"query movies {missing[:5]} are not in the catalogue"
+        hits1 = hits5 = 0
+        latencies = []
+        for movie_id, vector in zip(truth, embedded[kind]):
+            start = time.perf_counter()
+            rows, _ = recommender.search(vector, top_k=5)
+            found = [int(recommender.ids[r]) for r in rows[0]]
+            recommender.get_movie(found[0])
+            latencies.append(time.perf_counter() - start)
+            hits1 += found[0] == movie_id
+            hits5 += movie_id in found
+        results["recognition"][kind] = {"recall@1": hits1 / max(len(items), 1),
+                                        "recall@5": hits5 / max(len(items), 1),
+                                        "search": latency_stats(latencies)}
+        print(f"🎯 {kind:<9} recall@1={hits1 / max(len(items), 1):.3f}  recall@5={hits5 / max(len(items), 1):.3f}  "
+              f"search p50 {results['recognition'][kind]['search'].get('p50_ms', 0):.2f} ms")
+
+    latencies = []
+    for _, path in queries["original"][:n_end_to_end]:
+        start = time.perf_counter()
+        recommender.find_best_match(path)
+        latencies.append(time.perf_counter() - start)
+    results["find_best_match"] = latency_stats(latencies)
+    print(f"⏱️ find_best_match p50 {results['find_best_match'].get('p50_ms', 0):.1f} ms")
+
+    rng = np.random.default_rng(seed)
+    movie_ids = recommender.metadata["id"].to_numpy()[rng.integers(0, len(recommender.metadata), n_recommend)]
+    results["recommend"] = {}
+    for alpha in (0.6, 1.0):
+        latencies = []
+        for movie_id in movie_ids:
+            start = time.perf_counter()
+            recommender.recommend(int(movie_id), top_n=5, alpha=alpha)
+            latencies.append(time.perf_counter() - start)
+        results["recommend"][f"alpha={alpha}"] = latency_stats(latencies)
+        print(f"⏱️ recommend alpha={alpha} p50 {results['recommend'][f'alpha={alpha}']['p50_ms']:.2f} ms")
+    return results
+
+
+def environment():
+    info = {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "numpy": np.__version__, "pandas": pd.__version__}
+    try:
+        import torch
+        info.update(torch=torch.__version__, torch_threads=torch.get_num_threads())
+    except ImportError:
+        pass
+    try:
+        info["git"] = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                     text=True).stdout.strip() or None
+    except OSError:
+        pass
+    return info
+
+
+def run(args):
+    metadata = pd.read_csv(args.metadata).dropna(subset=["genres", "description", "cast", "studio", "director"])
+    store = EmbeddingStore(args.store)
+    results = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(),
+               "config": vars(args), "catalogues": []}
+
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        # Queries only from the real movies every catalogue keeps, so none can miss by construction
+        print(f"🧪 {args.queries} query posters x {len(PERTURBATIONS)} variants")
+        queries = make_queries(real_movies(metadata, store, min(args.sizes)), store, workdir, args.queries, args.seed)
+        embedded = None
+
+        for size in args.sizes:
+            print(f"📚 Catalogue of {size} movies ({args.search_mode} search)")
+            paths = build_catalogue(metadata, store, size, workdir, args.seed, args.search_mode)
+            start = time.perf_counter()
+            recommender = ContentBasedRecommender(**paths)  # Cold: builds the TF-IDF and neighbour caches
+            cold = time.perf_counter() - start
+            startup = probe_startup(paths)
+            print(f"🚀 startup cold {cold:.2f}s, warm {startup.get('seconds', float('nan')):.2f}s, "
+                  f"peak RSS {startup.get('peak_rss_mb') or float('nan'):.0f} MB")
+
+            if embedded is None:  # Catalogue-independent: once, with the first recommender
+                results["extraction"] = bench_extraction(recommender, metadata, args.extract_images, args.batch_sizes)
+                embedded, results["embedding"] = embed_queries(recommender, queries)
+                print(f"⏱️ query embedding p50 {results['embedding'].get('p50_ms', 0):.1f} ms")
+
+            entry = {"size": size, "search_mode": args.search_mode, "cold_startup_s": cold, "startup": startup}
+            entry.update(bench_catalogue(recommender, queries, embedded, args.end_to_end, args.recommend, args.seed))
+            results["catalogues"].append(entry)
+            del recommender
+
+    results["peak_rss_mb"] = peak_rss_mb()
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(results, fh, indent=2)
+    print(f"💾 Results written to {args.output}")
+    return results
+
+
+if __name__ == "__main__":  # python -m Scripts.benchmark
+    parser = argparse.ArgumentParser(description="Benchmark recognition and recommendation hot paths")
+    parser.add_argument("--metadata", default=default_metadata_path)
+    parser.add_argument("--store", default=default_store_path)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="catalogue sizes")
+    parser.add_argument("--search-mode", choices=["exact", "ivf", "compressed"], default="exact")
+    parser.add_argument("--queries", type=int, default=50, help="real posters, each in every variant")
+    parser.add_argument("--end-to-end", type=int, default=20, help="find_best_match calls per size")
+    parser.add_argument("--recommend", type=int, default=200, help="recommend calls per alpha and size")
+    parser.add_argument("--extract-images", type=int, default=64, help="posters for the throughput test")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=BATCH_SIZES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=None, help="scratch folder for synthetic catalogues")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    run(parser.parse_args())
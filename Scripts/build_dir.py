@@ -1,23 +1,96 @@
+import io
+import os
 import csv
+import argparse
+from multiprocessing import Pool
+
+# Run from the project root: python -m Scripts.build_dir [--roles Director Writer]
+# crew.csv is split into byte ranges on line boundaries; a process pool filters
+# each range and the rows are written in file order as each range finishes, so
+# memory stays at a few ranges whatever the size of the dump. Assumes no quoted
+# field spans lines (true for the crew dump: id, role, name).
 
 # File paths
-input_file = '../Data/Raw/crew.csv'  # Input CSV file
-output_file = '../Data/Raw/directors.csv'  # Output CSV file
-
-# List to store directors
-directors = []
-
-# Read the original CSV file
-with open(input_file, mode='r', newline='', encoding='utf-8') as infile:
-    reader = csv.DictReader(infile)  # Read rows as dictionaries
-    for row in reader:
-        if row['role'] == 'Director':  # Filter only directors
-            directors.append({'id': row['id'], 'name': row['name']})  # Save id and name
-
-# Write new CSV file with only directors
-with open(output_file, mode='w', newline='', encoding='utf-8') as outfile:
-    writer = csv.DictWriter(outfile, fieldnames=['id', 'name'])  # Define columns
-    writer.writeheader()  # Write column headers
-    writer.writerows(directors)  # Write director rows
-
-print(f"Creato il file {output_file} con {len(directors)} director.")  # Confirm result
+input_file = 'Data/Raw/crew.csv'  # Input CSV file
+output_dir = 'Data/Raw'  # One <role>s.csv per role, e.g. directors.csv
+CHUNK_BYTES = 64 * 1024 * 1024  # Bytes of crew.csv per task
+
+
+def output_file_for(role):
+    return os.path.join(output_dir, f"{role.lower()}s.csv")
+
+
+def byte_ranges(path, data_start, chunk_bytes):
+    # (start, stop) offsets; each task re-aligns them to line starts itself
+    size = os.path.getsize(path)
+    return [(start, min(start + chunk_bytes, size)) for start in range(data_start, size, chunk_bytes)]
+
+
+def read_lines(path, start, stop, data_start):
+    # Every line that starts in [start, stop): skip the partial first line, finish the last one
+    with open(path, 'rb') as infile:
+        if start > data_start:
+            infile.seek(start - 1)
+            infile.readline()  # Rest of a line owned by the previous range
+        else:
+            infile.seek(start)
+        data = infile.read(max(stop - infile.tell(), 0))
+        if data and not data.endswith(b'\n'):
+            data += infile.readline()
+    return data.decode('utf-8')
+
+
+def filter_range(task):
+    # Worker: CSV text of the wanted (id, name) rows per role, for one byte range
+    path, start, stop, data_start, columns, roles = task
+    id_col, role_col, name_col = columns
+    buffers = {role: io.StringIO() for role in roles}
+    writers = {role: csv.writer(buffer) for role, buffer in buffers.items()}
+    counts = dict.fromkeys(roles, 0)
+    width = max(columns)
+    for row in csv.reader(io.StringIO(read_lines(path, start, stop, data_start), newline='')):
+        if len(row) <= width:  # Blank or truncated line
+            continue
+        writer = writers.get(row[role_col])
+        if writer is not None:  # Filter only the requested roles
+            writer.writerow([row[id_col], row[name_col]])  # Save id and name
+            counts[row[role_col]] += 1
+    return {role: buffer.getvalue() for role, buffer in buffers.items()}, counts
+
+
+def extract_roles(path=input_file, roles=("Director",), workers=None, chunk_bytes=CHUNK_BYTES):
+    # Read the header once, then stream every range's rows to the output files
+    with open(path, 'rb') as infile:
+        header = next(csv.reader([infile.readline().decode('utf-8')]))
+        data_start = infile.tell()  # First byte after the header line
+    columns = (header.index('id'), header.index('role'), header.index('name'))
+
+    totals = dict.fromkeys(roles, 0)
+    outputs = {role: open(output_file_for(role), mode='w', newline='', encoding='utf-8') for role in roles}
+    try:
+        for role, outfile in outputs.items():
+            csv.writer(outfile).writerow(['id', 'name'])  # Write column headers
+        tasks = [(path, start, stop, data_start, columns, roles)
+                 for start, stop in byte_ranges(path, data_start, chunk_bytes)]
+        with Pool(workers) as pool:
+            for texts, counts in pool.imap(filter_range, tasks):  # In file order, as ranges finish
+                for role, text in texts.items():
+                    outputs[role].write(text)
+                    totals[role] += counts[role]
+    finally:
+        for outfile in outputs.values():
+            outfile.close()
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract directors (and other crew roles) from crew.csv")
+    parser.add_argument("--input", default=input_file)
+    parser.add_argument("--roles", nargs="+", default=["Director"], help="e.g. Director Writer Composer")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--chunk-mb", type=int, default=CHUNK_BYTES // (1024 * 1024), help="MB of crew.csv per task")
+    args = parser.parse_args()
+
+    totals = extract_roles(args.input, tuple(args.roles), args.workers, args.chunk_mb * 1024 * 1024)
+    for role, count in totals.items():
+        print(f"Creato il file {output_file_for(role)} con {count} {role.lower()}.")  # Confirm result
@@ -0,0 +1,220 @@
+import os  # File system
+import time  # Benchmark timing
+import argparse  # Command line
+import numpy as np  # Numeric operations
+from .embedding_store import EmbeddingStore, default_store_path
+from .ann_index import ExactIndex, top_k_rows
+
+# Compressed copy of the poster embeddings for low-memory recognition.
+# Vectors are projected with (uncentered) PCA, which keeps dot products,
+# then stored either as int8 per-dimension scalar codes ("sq8") or as
+# product-quantization codes ("pq", one byte per sub-space). Queries are
+# scored against the codes and the best candidates are re-ranked with the
+# full vectors, read lazily from the memory-mapped store.
+
+default_compressed_path = "features.compressed.npz"
+default_metadata_path = "Data/metadata.csv"
+DEFAULT_PCA_DIM = 256  # Projected dimension
+DEFAULT_SUBSPACES = 32  # PQ sub-spaces (bytes per vector)
+DEFAULT_RERANK = 64  # Candidates re-scored with full vectors
+BLOCK_ROWS = 65536  # Codes decoded per block while scoring
+
+
+def fit_pca(features, dim, sample_size=50000, seed=0):
+    # Top eigenvectors of the second-moment matrix (no centering, so x.y ~ xW.yW)
+    rng = np.random.default_rng(seed)
+    picks = np.sort(rng.choice(len(features), min(sample_size, len(features)), replace=False))
+    sample = np.asarray(features[picks], dtype=np.float32)
+    eigvals, eigvecs = np.linalg.eigh(sample.T @ sample)
+    return np.ascontiguousarray(eigvecs[:, ::-1][:, :dim], dtype=np.float32)
+
+
+def project(features, projection):
+    # Blocked projection so the full matrix is never copied into RAM
+    out = np.empty((len(features), projection.shape[1]), dtype=np.float32)
+    for start in range(0, len(features), BLOCK_ROWS):
+        out[start:start + BLOCK_ROWS] = np.asarray(features[start:start + BLOCK_ROWS], dtype=np.float32) @ projection
+    return out
+
+
+def kmeans(data, n_clusters, n_iter=15, seed=0):
+    # Plain Euclidean k-means for the PQ codebooks
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), n_clusters, replace=len(data) < n_clusters)].copy()
+    for _ in range(n_iter):
+        labels = nearest(data, centroids)
+        for c in range(n_clusters):
+            members = data[labels == c]
+            centroids[c] = members.mean(axis=0) if len(members) else data[rng.integers(len(data))]
+    return centroids
+
+
+def nearest(data, centroids):
+    dists = (centroids ** 2).sum(axis=1)[None, :] - 2 * data @ centroids.T
+    return np.argmin(dists, axis=1)
+
+
+class CompressedIndex:
+    def __init__(self, features, projection, method, codes, scale=None, codebooks=None,
+                 rerank=DEFAULT_RERANK):
+        self.features = features  # Full unit-length vectors, only touched for re-ranking
+        self.projection = projection  # (d, dim)
+        self.method = method  # "sq8" or "pq"
+        self.codes = codes  # (N, dim) int8 or (N, subspaces) uint8
+        self.scale = scale  # sq8: per-dimension step
+        self.codebooks = codebooks  # pq: (subspaces, 256, dim / subspaces)
+        self.rerank = rerank
+
+    @classmethod
+    def build(cls, features, dim=DEFAULT_PCA_DIM, method="sq8", subspaces=DEFAULT_SUBSPACES,
+              rerank=DEFAULT_RERANK, seed=0):
+        dim = min(dim, features.shape[1])
+        projection = fit_pca(features, dim, seed=seed)
+        projected = project(features, projection)
+
+        if method == "sq8":
+            scale = np.maximum(np.abs(projected).max(axis=0), 1e-12) / 127.0
+            codes = np.clip(np.round(projected / scale), -127, 127).astype(np.int8)
+            return cls(features, projection, method, codes, scale=scale.astype(np.float32), rerank=rerank)
+
+        if method == "pq":
+            if dim % subspaces:
+                raise ValueError(f"PCA dimension {dim} is not divisible by {subspaces} sub-spaces")
+            sub_dim = dim // subspaces
+            rng = np.random.default_rng(seed)
+            sample = projected[rng.choice(len(projected), min(len(projected), 256 * 64), replace=False)]
+            codebooks = np.empty((subspaces, 256, sub_dim), dtype=np.float32)
+            codes = np.empty((len(projected), subspaces), dtype=np.uint8)
+            for j in range(subspaces):
+                part = slice(j * sub_dim, (j + 1) * sub_dim)
+                codebooks[j] = kmeans(sample[:, part], 256, seed=seed + j)
+                for start in range(0, len(projected), BLOCK_ROWS):
+                    codes[start:start + BLOCK_ROWS, j] = nearest(projected[start:start + BLOCK_ROWS, part], codebooks[j])
+            return cls(features, projection, method, codes, codebooks=codebooks, rerank=rerank)
+
+        raise ValueError(f"Unknown compression method '{method}'")
+
+    def memory_bytes(self):
+        # Resident size of everything search keeps in RAM
+        total = self.projection.nbytes + self.codes.nbytes
+        for extra in (self.scale, self.codebooks):
+            if extra is not None:
+                total += extra.nbytes
+        return total
+
+    def save(self, path, fingerprint):
+        arrays = {"projection": self.projection, "codes": self.codes,
+                  "method": np.array(self.method), "fingerprint": np.array(fingerprint)}
+        if self.scale is not None:
+            arrays["scale"] = self.scale
+        if self.codebooks is not None:
+            arrays["codebooks"] = self.codebooks
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as fh:
+            np.savez(fh, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, features, fingerprint, rerank=DEFAULT_RERANK):
+        # None if missing or built for another version of the store
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            if str(data["fingerprint"]) != fingerprint:
+                return None
+            return cls(features, data["projection"], str(data["method"]), data["codes"],
+                       scale=data["scale"] if "scale" in data else None,
+                       codebooks=data["codebooks"] if "codebooks" in data else None,
+                       rerank=rerank)
+
+    def approximate_scores(self, queries):
+        # (q, N) dot products estimated from the codes
+        projected = queries @ self.projection
+        scores = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        if self.method == "sq8":
+            weighted = projected * self.scale
+            for start in range(0, len(self.codes), BLOCK_ROWS):
+                block = self.codes[start:start + BLOCK_ROWS].astype(np.float32)
+                scores[:, start:start + len(block)] = weighted @ block.T
+            return scores
+
+        # PQ asymmetric distance: per-query lookup tables, one per sub-space
+        subspaces, _, sub_dim = self.codebooks.shape
+        tables = np.einsum("qjd,jcd->qjc", projected.reshape(len(queries), subspaces, sub_dim), self.codebooks)
+        for start in range(0, len(self.codes), BLOCK_ROWS):
+            block = self.codes[start:start + BLOCK_ROWS]
+            acc = np.zeros((len(queries), len(block)), dtype=np.float32)
+            for j in range(subspaces):
+                acc += tables[:, j, block[:, j]]
+            scores[:, start:start + len(block)] = acc
+        return scores
+
+    def search(self, queries, top_k=5, rerank=None):
+        rerank = max(rerank or self.rerank, top_k)
+        candidates, _ = top_k_rows(self.approximate_scores(queries), rerank)
+
+        # Re-rank with exact scores; only these rows are paged in from disk
+        rows = np.zeros((len(queries), top_k), dtype=np.int64)
+        scores = np.zeros((len(queries), top_k), dtype=np.float32)
+        for q, (query, cands) in enumerate(zip(queries, candidates)):
+            cands = np.sort(cands)
+            top, top_sims = top_k_rows((np.asarray(self.features[cands]) @ query)[None, :], top_k)
+            rows[q, :top.shape[1]] = cands[top[0]]
+            scores[q, :top.shape[1]] = top_sims[0]
+        return rows, scores
+
+
+def benchmark(store, index, queries, reranks=(0, 16, 64, 256)):
+    # Memory footprint and recall@1 of the compressed path against exact search for the same queries
+    features = store.features
+
+    full_bytes = len(features) * store.dim * 4
+    print(f"💾 full float32: {full_bytes / 2**20:.1f} MiB, {index.method}: "
+          f"{index.memory_bytes() / 2**20:.1f} MiB ({full_bytes / index.memory_bytes():.1f}x smaller)")
+
+    start = time.perf_counter()
+    truth, _ = ExactIndex(features).search(queries, 1)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    print(f"📏 exact: {exact_ms:.3f} ms/query over {len(features)} vectors")
+
+    for rerank in reranks:
+        start = time.perf_counter()
+        if rerank:
+            found, _ = index.search(queries, 1, rerank)
+        else:
+            found, _ = top_k_rows(index.approximate_scores(queries), 1)  # Codes only
+        ms = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = float(np.mean(found[:, 0] == truth[:, 0]))
+        print(f"⚡ rerank={rerank:<4d} recall@1={recall:.3f}  {ms:.3f} ms/query")
+
+
+if __name__ == "__main__":  # python -m Scripts.compressed_index build|bench
+    parser = argparse.ArgumentParser(description="Build or benchmark compressed poster embeddings")
+    parser.add_argument("command", choices=["build", "bench"])
+    parser.add_argument("--store", default=default_store_path, help="embedding store")
+    parser.add_argument("--index", default=default_compressed_path, help="compressed index file")
+    parser.add_argument("--method", choices=["sq8", "pq"], default="sq8", help="int8 scalar or product quantization")
+    parser.add_argument("--dim", type=int, default=DEFAULT_PCA_DIM, help="PCA dimension")
+    parser.add_argument("--subspaces", type=int, default=DEFAULT_SUBSPACES, help="PQ sub-spaces")
+    parser.add_argument("--metadata", default=default_metadata_path, help="posters for the benchmark queries")
+    parser.add_argument("--queries", type=int, default=100, help="benchmark posters, each in every perturbation")
+    parser.add_argument("--synthetic", action="store_true", help="query with noisy store vectors instead of posters")
+    parser.add_argument("--noise", type=float, default=0.05, help="perturbation of the synthetic queries")
+    parser.add_argument("--rerank", type=int, nargs="+", default=[0, 16, 64, 256], help="re-rank depths to test")
+    args = parser.parse_args()
+
+    store = EmbeddingStore(args.store)
+    if args.command == "build":
+        start = time.perf_counter()
+        index = CompressedIndex.build(store.features, args.dim, args.method, args.subspaces)
+        index.save(args.index, store.fingerprint)
+        print(f"✅ {args.method} index ({index.memory_bytes() / 2**20:.1f} MiB) saved to {args.index} "
+              f"({time.perf_counter() - start:.1f}s)")
+    else:
+        index = CompressedIndex.load(args.index, store.features, store.fingerprint)
+        if index is None:
+            print(f"⚠️ {args.index} missing or stale, building a temporary index...")
+            index = CompressedIndex.build(store.features, args.dim, args.method, args.subspaces)
+        from .benchmark import index_queries  # Imports the recommender, so only for bench
+        queries = index_queries(store, args.metadata, args.queries, args.noise, synthetic=args.synthetic)
+        benchmark(store, index, queries, args.rerank)
@@ -0,0 +1,246 @@
+import os  # Exported ONNX models
+import time  # Benchmark timing
+import argparse  # Command line
+import threading  # Guards the lazy load
+import numpy as np  # Feature arrays
+
+# CNN that turns posters into feature vectors, shared by extract_features_cnn.py
+# and the recommender so both always compute the same features.
+#
+#   engine = EmbeddingEngine("resnet50", "int8", threads=4)
+#   features = engine.embed(images)  # (n, engine.dim) float32
+#
+#   python -m Scripts.embedding_engine bench --backends eager torchscript int8 --threads 4
+#
+# Backbones are ImageNet classifiers with the classification head removed, so the
+# output is the globally pooled feature vector. Backends:
+#   eager        plain PyTorch (CUDA when available)
+#   torchscript  traced, frozen and optimized for inference
+#   compile      torch.compile; the first batch pays the compilation
+#   int8         torchvision's statically quantized models (fbgemm/qnnpack kernels,
+#                CPU only). Dynamic quantization would only touch Linear layers,
+#                and there are none left once the head is removed
+#   onnx         ONNX Runtime, when installed; the model is exported once to
+#                Data/engines/<engine id>.onnx
+#
+# Every engine has an id that is written to the embedding store. Backends that
+# compute the same function (eager, torchscript, compile, onnx) share an id. int8
+# and other backbones have ids of their own, so their vectors are never mixed with
+# vectors from another model.
+
+# name -> (float weights, quantized weights, feature size)
+BACKBONES = {
+    "resnet50": ("IMAGENET1K_V2", "IMAGENET1K_FBGEMM_V2", 2048),
+    "resnet18": ("IMAGENET1K_V1", "IMAGENET1K_FBGEMM_V1", 512),
+    "mobilenet_v3_large": ("IMAGENET1K_V1", "IMAGENET1K_QNNPACK_V1", 960),
+}
+BACKENDS = ("eager", "torchscript", "compile", "int8", "onnx")
+DEFAULT_BACKBONE = "resnet50"
+DEFAULT_BACKEND = "eager"
+default_engine_dir = "Data/engines"
+INPUT_SIZE = 224
+MEAN = [0.485, 0.456, 0.406]  # ImageNet channel statistics
+STD = [0.229, 0.224, 0.225]
+
+# Weight enum classes in torchvision.models and torchvision.models.quantization
+WEIGHT_ENUMS = {"resnet50": ("ResNet50_Weights", "ResNet50_QuantizedWeights"),
+                "resnet18": ("ResNet18_Weights", "ResNet18_QuantizedWeights"),
+                "mobilenet_v3_large": ("MobileNet_V3_Large_Weights", "MobileNet_V3_Large_QuantizedWeights")}
+
+
+def engine_id(backbone=DEFAULT_BACKBONE, backend=DEFAULT_BACKEND):
+    # e.g. "resnet50.IMAGENET1K_V2.avgpool", the id of stores written before engines existed
+    check_engine(backbone, backend)
+    weights, quantized_weights, _ = BACKBONES[backbone]
+    if backend == "int8":
+        return f"{backbone}.{quantized_weights}.int8.avgpool"
+    return f"{backbone}.{weights}.avgpool"
+
+
+def engine_for(model_id, threads=None):
+    # Engine that computes the vectors of a store written with `model_id`
+    for backbone in BACKBONES:
+        for backend in ("eager", "int8"):
+            if engine_id(backbone, backend) == model_id:
+                return EmbeddingEngine(backbone, backend, threads)
+    raise ValueError(f"No engine computes '{model_id}' vectors")
+
+
+def engine_dim(backbone=DEFAULT_BACKBONE):
+    return BACKBONES[backbone][2]
+
+
+def check_engine(backbone, backend):
+    if backbone not in BACKBONES:
+        raise ValueError(f"Unknown backbone '{backbone}', expected one of {', '.join(BACKBONES)}")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {', '.join(BACKENDS)}")
+
+
+def image_transform():
+    # Define preprocessing for CNN input images
+    import torchvision.transforms as transforms  # Image transforms
+    return transforms.Compose([
+        transforms.Resize((INPUT_SIZE, INPUT_SIZE)),  # Resize to 224x224
+        transforms.ToTensor(),  # Convert to tensor
+        transforms.Normalize(mean=MEAN, std=STD)  # Normalize
+    ])
+
+
+def normalize_uint8(pixels, device="cpu"):
+    # (n, 224, 224, 3) uint8 posters -> the tensor image_transform would give, normalized on `device`
+    import torch  # Deep learning
+    batch = torch.from_numpy(np.ascontiguousarray(pixels)).to(device).permute(0, 3, 1, 2).float()
+    mean = torch.tensor(MEAN, device=device).view(1, 3, 1, 1) * 255
+    std = torch.tensor(STD, device=device).view(1, 3, 1, 1) * 255
+    return (batch - mean) / std
+
+
+def strip_head(model):
+    # Classifier -> identity, the forward pass then ends at the pooled features
+    import torch  # Deep learning
+    if hasattr(model, "fc"):
+        model.fc = torch.nn.Identity()
+    else:
+        model.classifier = torch.nn.Identity()
+    return model
+
+
+def build_backbone(backbone, quantized=False):
+    import torchvision.models as models  # Pretrained models
+    weights_name, quantized_name, _ = BACKBONES[backbone]
+    float_enum, quantized_enum = WEIGHT_ENUMS[backbone]
+    if quantized:
+        import torchvision.models.quantization as quantization  # Quantized ResNet / MobileNet
+        weights = getattr(getattr(quantization, quantized_enum), quantized_name)
+        return strip_head(getattr(quantization, backbone)(weights=weights, quantize=True))
+    weights = getattr(getattr(models, float_enum), weights_name)
+    return strip_head(getattr(models, backbone)(weights=weights))
+
+
+class EmbeddingEngine:
+    def __init__(self, backbone=DEFAULT_BACKBONE, backend=DEFAULT_BACKEND, threads=None, device=None,
+                 engine_dir=default_engine_dir):
+        check_engine(backbone, backend)
+        self.backbone = backbone
+        self.backend = backend
+        self.threads = threads  # Intra-op threads, None keeps the library default
+        self.engine_id = engine_id(backbone, backend)
+        self.dim = engine_dim(backbone)
+        self.engine_dir = engine_dir
+        self.requested_device = device
+        self.model = self.device = self.transform = self.session = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        # Import torch and build the model; later calls return at once
+        with self._lock:
+            if self.model is not None or self.session is not None:
+                return self
+            import torch  # Deep learning
+
+            if self.threads:
+                torch.set_num_threads(self.threads)
+            cpu_only = self.backend in ("int8", "onnx")
+            device = self.requested_device or ("cuda" if torch.cuda.is_available() and not cpu_only else "cpu")
+            self.device = torch.device(device)
+            self.transform = image_transform()
+
+            if self.backend == "onnx":
+                self.session = self._onnx_session()
+                return self
+
+            model = build_backbone(self.backbone, quantized=self.backend == "int8").eval().to(self.device)
+            if self.backend == "torchscript":
+                example = torch.zeros(1, 3, INPUT_SIZE, INPUT_SIZE, device=self.device)
+                with torch.inference_mode():
+                    model = torch.jit.optimize_for_inference(torch.jit.freeze(torch.jit.trace(model, example)))
+            elif self.backend == "compile":
+                model = torch.compile(model)
+            self.model = model
+            return self
+
+    def _onnx_session(self):
+        try:
+            import onnxruntime  # Optional dependency
+        except ImportError:
+            raise ValueError("The onnx backend needs onnxruntime: pip install onnxruntime")
+        import torch  # Exporter
+        path = os.path.join(self.engine_dir, f"{self.engine_id}.onnx")
+        if not os.path.exists(path):
+            os.makedirs(self.engine_dir, exist_ok=True)
+            model = build_backbone(self.backbone).eval()
+            example = torch.zeros(1, 3, INPUT_SIZE, INPUT_SIZE)
+            tmp_path = path + ".tmp"
+            torch.onnx.export(model, example, tmp_path, input_names=["input"], output_names=["features"],
+                              dynamic_axes={"input": {0: "batch"}, "features": {0: "batch"}})
+            os.replace(tmp_path, path)
+        options = onnxruntime.SessionOptions()
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+        return onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def forward(self, batch):
+        # (n, 3, 224, 224) normalized float tensor -> (n, dim) float32 array
+        self.load()
+        import torch  # Already loaded by load
+        if self.session is not None:
+            return self.session.run(None, {"input": batch.cpu().numpy()})[0].reshape(len(batch), -1)
+        with torch.inference_mode():  # No autograd bookkeeping
+            return self.model(batch.to(self.device)).flatten(1).float().cpu().numpy()
+
+    def embed(self, images):
+        # PIL images -> (n, dim) features
+        if not images:
+            return np.empty((0, self.dim), dtype=np.float32)
+        self.load()
+        import torch  # Already loaded by load
+        return self.forward(torch.stack([self.transform(image.convert("RGB")) for image in images]))
+
+    def describe(self):
+        threads = self.threads or "default"
+        return f"{self.backbone} ({self.backend}, {threads} threads)"
+
+
+def benchmark(backbones, backends, threads=None, batch_size=8, batches=5, poster_dir="Data/Posters"):
+    # Throughput per engine, and cosine agreement with the eager model of the same backbone
+    from PIL import Image  # Posters
+    import torch  # Input batches
+    names = sorted(f for f in os.listdir(poster_dir) if f.lower().endswith((".jpg", ".png")))[:batch_size]
+    images = [Image.open(os.path.join(poster_dir, name)).convert("RGB") for name in names]
+    batch = torch.stack([image_transform()(image) for image in images])
+    for backbone in backbones:
+        reference = None
+        for backend in backends:
+            engine = EmbeddingEngine(backbone, backend, threads)
+            try:
+                start = time.perf_counter()
+                engine.load()
+                features = engine.forward(batch)  # Warm-up; compiles for torch.compile
+                load_s = time.perf_counter() - start
+            except Exception as e:
+                print(f"⚠️ {engine.describe()}: {e}")
+                continue
+            start = time.perf_counter()
+            for _ in range(batches):
+                engine.forward(batch)
+            rate = batches * len(batch) / (time.perf_counter() - start)
+            unit = features / np.maximum(np.linalg.norm(features, axis=1, keepdims=True), 1e-12)
+            if backend == "eager":
+                reference = unit
+            agreement = f"cosine vs eager {np.mean(np.sum(unit * reference, axis=1)):.4f}" if reference is not None else ""
+            print(f"⚡ {engine.describe():<40s} {rate:7.1f} images/s  load {load_s:5.1f}s  {agreement}  "
+                  f"[{engine.engine_id}]")
+
+
+if __name__ == "__main__":  # python -m Scripts.embedding_engine bench
+    parser = argparse.ArgumentParser(description="Compare poster embedding engines")
+    parser.add_argument("command", choices=["bench"])
+    parser.add_argument("--backbones", nargs="+", choices=list(BACKBONES), default=[DEFAULT_BACKBONE])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=["eager", "torchscript", "int8"])
+    parser.add_argument("--threads", type=int, default=None, help="intra-op CPU threads")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--batches", type=int, default=5, help="timed batches per engine")
+    parser.add_argument("--poster-dir", default="Data/Posters")
+    args = parser.parse_args()
+    benchmark(args.backbones, args.backends, args.threads, args.batch_size, args.batches, args.poster_dir)
@@ -0,0 +1,166 @@
+import os  # File system
+import json  # Header format
+import struct  # Header length field
+import argparse  # Command line
+import numpy as np  # Numeric operations
+
+# Single-file embedding store, opened read-only with mmap so every process
+# on the host shares the same pages through the OS cache.
+#
+# Layout:
+#   8 bytes   magic b"FYMEMB01"
+#   4 bytes   little-endian header length
+#   JSON      header: version, dim, dtype, count, model_id, normalized and section offsets
+#   padding   up to a 64-byte boundary
+#   features  count x dim matrix
+#   ids       count int64, row order
+#   index     count int64 ids sorted, then count int64 rows of those ids
+
+MAGIC = b"FYMEMB01"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+# Default store path and the model the stored vectors come from
+default_store_path = "features.emb"
+DEFAULT_MODEL_ID = "resnet50.IMAGENET1K_V2.avgpool"
+DEFAULT_DIM = 2048
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def normalize_rows(features):
+    # L2-normalize each row so cosine similarity becomes a plain dot product
+    features = np.asarray(features, dtype=np.float32)
+    norms = np.linalg.norm(features, axis=1, keepdims=True)
+    return features / np.maximum(norms, 1e-12)
+
+
+def write_store(path, ids, features, model_id=DEFAULT_MODEL_ID, dtype=np.float32, normalize=True):
+    ids = np.asarray(ids, dtype=np.int64)
+    features = np.asarray(features, dtype=dtype)
+    if normalize and features.ndim == 2:
+        features = normalize_rows(features).astype(dtype)
+    if features.ndim != 2 or len(features) != len(ids):
+        raise ValueError(f"Expected {len(ids)} feature rows, got array of shape {features.shape}")
+    if len(np.unique(ids)) != len(ids):
+        raise ValueError("Duplicate movie ids in embedding store")
+
+    order = np.argsort(ids, kind="stable")  # id -> row index, searched with searchsorted
+    count, dim = features.shape
+
+    header = {"version": FORMAT_VERSION, "dim": int(dim), "dtype": np.dtype(dtype).name,
+              "count": int(count), "model_id": model_id, "normalized": bool(normalize)}
+    # Offsets depend on the header size, so size the header with placeholders first
+    header.update(features_offset=0, ids_offset=0, index_offset=0, order_offset=0)
+    header_size = len(json.dumps(header).encode("utf-8")) + 64
+    header["features_offset"] = _align(len(MAGIC) + 4 + header_size)
+    header["ids_offset"] = _align(header["features_offset"] + features.nbytes)
+    header["index_offset"] = header["ids_offset"] + ids.nbytes
+    header["order_offset"] = header["index_offset"] + ids.nbytes
+    header_bytes = json.dumps(header).encode("utf-8").ljust(header_size)
+
+    # Write next to the target and swap in atomically
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as fh:
+        fh.write(MAGIC)
+        fh.write(struct.pack("<I", len(header_bytes)))
+        fh.write(header_bytes)
+        fh.write(b"\0" * (header["features_offset"] - fh.tell()))
+        fh.write(np.ascontiguousarray(features).tobytes())
+        fh.write(b"\0" * (header["ids_offset"] - fh.tell()))
+        fh.write(ids.tobytes())
+        fh.write(ids[order].tobytes())
+        fh.write(order.astype(np.int64).tobytes())
+    os.replace(tmp_path, path)
+
+
+def read_header(path):
+    with open(path, "rb") as fh:
+        if fh.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an embedding store")
+        (length,) = struct.unpack("<I", fh.read(4))
+        header = json.loads(fh.read(length).decode("utf-8"))
+    if header.get("version") != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported store version {header.get('version')}")
+    return header
+
+
+class EmbeddingStore:
+    def __init__(self, path=default_store_path, model_id=None, dim=None):
+        self.path = path
+        self.header = read_header(path)
+        self.model_id = self.header["model_id"]
+        self.dim = self.header["dim"]
+        self.dtype = np.dtype(self.header["dtype"])
+        self.normalized = self.header.get("normalized", False)  # Rows already unit length
+        count = self.header["count"]
+        # Changes whenever the store is rewritten; derived indexes are keyed on it
+        stat = os.stat(path)
+        self.fingerprint = f"{self.model_id}:{self.dim}:{count}:{stat.st_size}:{stat.st_mtime_ns}"
+
+        # Refuse vectors produced by a different model or of a different size
+        if model_id is not None and self.model_id != model_id:
+            raise ValueError(f"{path} was built with model '{self.model_id}', expected '{model_id}'")
+        if dim is not None and self.dim != dim:
+            raise ValueError(f"{path} stores {self.dim}-d vectors, expected {dim}-d")
+
+        if count == 0:  # mmap cannot map an empty region
+            self.features = np.empty((0, self.dim), dtype=self.dtype)
+            self.ids = self._sorted_ids = self._order = np.empty(0, dtype=np.int64)
+            return
+
+        def section(offset, dtype, shape):
+            return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+        self.features = section(self.header["features_offset"], self.dtype, (count, self.dim))
+        self.ids = section(self.header["ids_offset"], np.int64, (count,))
+        self._sorted_ids = section(self.header["index_offset"], np.int64, (count,))
+        self._order = section(self.header["order_offset"], np.int64, (count,))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, movie_id):
+        return self.row_of(movie_id) is not None
+
+    def rows_of(self, movie_ids):
+        # Vectorized id -> row lookup; -1 for unknown ids
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        if len(self._sorted_ids) == 0:
+            return np.full(movie_ids.shape, -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self._sorted_ids, movie_ids), len(self._sorted_ids) - 1)
+        found = self._sorted_ids[pos] == movie_ids
+        return np.where(found, self._order[pos], -1)
+
+    def row_of(self, movie_id):
+        row = int(self.rows_of([movie_id])[0])
+        return row if row >= 0 else None
+
+    def vector(self, movie_id):
+        row = self.row_of(movie_id)
+        return None if row is None else np.asarray(self.features[row])
+
+
+def convert_npy(features_path, ids_path, store_path=default_store_path, model_id=DEFAULT_MODEL_ID):
+    # Migrate a legacy features.npy / ids.npy pair into a single store
+    features = np.load(features_path)
+    ids = np.load(ids_path)
+    write_store(store_path, ids, features, model_id)
+    return len(ids)
+
+
+if __name__ == "__main__":  # python -m Scripts.embedding_store
+    parser = argparse.ArgumentParser(description="Inspect or create an embedding store")
+    parser.add_argument("store", nargs="?", default=default_store_path, help="store file")
+    parser.add_argument("--from-npy", nargs=2, metavar=("FEATURES", "IDS"),
+                        help="convert a legacy features.npy / ids.npy pair")
+    parser.add_argument("--model-id", default=DEFAULT_MODEL_ID, help="model identifier recorded in the header")
+    args = parser.parse_args()
+
+    if args.from_npy:
+        count = convert_npy(*args.from_npy, args.store, args.model_id)
+        print(f"✅ Wrote {count} vectors to {args.store}")
+    store = EmbeddingStore(args.store)
+    print(json.dumps(store.header, indent=2))
@@ -0,0 +1,114 @@
+import os  # File system
+import json  # Manifest format
+import glob  # Checkpoint discovery
+import shutil  # Checkpoint cleanup
+import hashlib  # Poster content hash
+import numpy as np  # Checkpoint chunks
+
+# Default locations, next to the embedding store
+default_manifest_path = "features_manifest.json"
+default_checkpoint_dir = "features_checkpoint"
+FULL_REBUILD_MARKER = "full_rebuild"  # In the checkpoint folder while a --full run is unfinished
+
+
+def file_sha1(path, block_size=1 << 20):
+    # Stream the file so large posters are never fully in memory
+    digest = hashlib.sha1()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def poster_entry(path, data=None):
+    # Manifest record of one poster: cheap stat fields plus a content hash
+    stat = os.stat(path)
+    sha1 = hashlib.sha1(data).hexdigest() if data is not None else file_sha1(path)
+    return {"path": path, "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns, "sha1": sha1}
+
+
+def stat_matches(entry, path):
+    # Fast path: same size and mtime means the file was not touched
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    return (entry.get("path") == path and entry.get("size") == stat.st_size
+            and entry.get("mtime_ns") == stat.st_mtime_ns)
+
+
+def load_manifest(path=default_manifest_path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def save_manifest(manifest, path=default_manifest_path):
+    # Write to a temp file first so a crash never leaves a truncated manifest
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def plan_update(metadata, manifest, stored_ids):
+    # Split metadata into posters that can be reused and posters to (re)embed
+    stored = {str(movie_id) for movie_id in stored_ids}
+    keep, todo = {}, []
+
+    for movie_id, path in zip(metadata["id"], metadata["poster_path"]):
+        key = str(movie_id)
+        entry = manifest.get(key)
+        if entry is not None and key in stored and os.path.exists(path):
+            if stat_matches(entry, path):
+                keep[key] = entry
+                continue
+            if entry.get("path") == path and entry.get("sha1") == file_sha1(path):
+                keep[key] = poster_entry(path)  # Touched but unchanged: refresh stat fields
+                continue
+        todo.append(movie_id)
+
+    removed = stored - {str(movie_id) for movie_id in metadata["id"]}
+    return keep, todo, removed
+
+
+# === Checkpoint chunks ===
+def write_chunk(checkpoint_dir, ids, features, entries, model_id):
+    # Each chunk is self-contained: ids, vectors and the poster records they came from
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    index = len(glob.glob(os.path.join(checkpoint_dir, "chunk_*.npz")))
+    chunk_path = os.path.join(checkpoint_dir, f"chunk_{index:05d}.npz")
+    tmp_path = chunk_path + ".tmp"
+    with open(tmp_path, "wb") as fh:
+        np.savez(fh, ids=np.asarray(ids), features=features,
+                 entries=np.array(json.dumps(entries)), model_id=np.array(model_id))
+    os.replace(tmp_path, chunk_path)
+    return chunk_path
+
+
+def load_chunks(checkpoint_dir, model_id):
+    # Yield (ids, features, entries) for every completed chunk of an interrupted run with the same model;
+    # chunks without a model id are stale and their posters are embedded again
+    for chunk_path in sorted(glob.glob(os.path.join(checkpoint_dir, "chunk_*.npz"))):
+        with np.load(chunk_path) as chunk:
+            if "model_id" not in chunk.files or str(chunk["model_id"]) != model_id:
+                continue
+            yield chunk["ids"], chunk["features"], json.loads(str(chunk["entries"]))
+
+
+def clear_chunks(checkpoint_dir):
+    if os.path.isdir(checkpoint_dir):
+        shutil.rmtree(checkpoint_dir)
+
+
+def start_full_rebuild(checkpoint_dir):
+    # Fresh checkpoint folder marked so that an interrupted rebuild resumes as a rebuild
+    clear_chunks(checkpoint_dir)
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    open(os.path.join(checkpoint_dir, FULL_REBUILD_MARKER), "w").close()
+
+
+def full_rebuild_pending(checkpoint_dir):
+    return os.path.exists(os.path.join(checkpoint_dir, FULL_REBUILD_MARKER))
@@ -0,0 +1,137 @@
+import os  # File system
+import re  # Fragment names
+import glob  # Fragment discovery
+import argparse  # Command line
+import numpy as np  # Numeric operations
+import pandas as pd  # Metadata order
+from .embedding_store import EmbeddingStore, write_store, default_store_path
+from .feature_manifest import load_manifest, save_manifest, default_manifest_path
+
+# Sharded feature extraction without a coordinator. Every worker (a local process
+# or a machine sharing the filesystem) runs
+#
+#   python extract_features_cnn.py --shard i/N      # i = 0 .. N-1
+#
+# and embeds only the movies with id % N == i. Each shard writes a fragment
+# store and manifest under features_shards/. Once all N are done,
+#
+#   python -m Scripts.feature_shards merge
+#
+# checks that the fragments form one complete set built with one model and
+# writes features.emb and features_manifest.json in metadata order. The result
+# is the same whichever shard finishes first, and matches what a single
+# unsharded run would write.
+
+default_shard_dir = "features_shards"
+default_metadata_path = "Data/metadata.csv"
+FRAGMENT_NAME = re.compile(r"shard-(\d+)-of-(\d+)\.emb$")
+
+
+def parse_shard(text):
+    # "i/N" -> (i, N) with 0 <= i < N
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{text}', expected i/N such as 0/4")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard '{text}': i must be in 0..N-1")
+    return index, count
+
+
+def shard_mask(ids, shard):
+    # Rows of the movies that belong to shard (i, N)
+    index, count = shard
+    return np.asarray(ids, dtype=np.int64) % count == index
+
+
+def shard_tag(shard):
+    return f"shard-{shard[0]:03d}-of-{shard[1]:03d}"
+
+
+def fragment_paths(shard, shard_dir=default_shard_dir):
+    # Fragment store, fragment manifest and checkpoint folder of one shard
+    base = os.path.join(shard_dir, shard_tag(shard))
+    return base + ".emb", base + ".json", base + ".checkpoint"
+
+
+def find_fragments(shard_dir=default_shard_dir):
+    # {shard: fragment store path}; every fragment must belong to the same N
+    fragments = {}
+    for path in sorted(glob.glob(os.path.join(shard_dir, "shard-*-of-*.emb"))):
+        match = FRAGMENT_NAME.search(path)
+        if match:
+            fragments[(int(match.group(1)), int(match.group(2)))] = path
+    counts = {count for _, count in fragments}
+    if not fragments:
+        raise ValueError(f"No shard fragments in {shard_dir}")
+    if len(counts) > 1:
+        raise ValueError(f"Fragments of different shard counts in {shard_dir}: {sorted(counts)}; remove the stale ones")
+    count = counts.pop()
+    missing = [index for index in range(count) if (index, count) not in fragments]
+    if missing:
+        raise ValueError(f"Missing shards {missing} of {count}; run them with --shard i/{count}")
+    return fragments
+
+
+def merge_fragments(shard_dir=default_shard_dir, metadata_path=default_metadata_path,
+                    store_path=default_store_path, manifest_path=default_manifest_path, clean=False):
+    fragments = find_fragments(shard_dir)
+    stores = {shard: EmbeddingStore(path) for shard, path in fragments.items()}
+
+    # Same model and vector size everywhere
+    first = stores[min(stores)]
+    for shard, store in stores.items():
+        if store.model_id != first.model_id or store.dim != first.dim:
+            raise ValueError(f"{fragments[shard]} was built with '{store.model_id}' ({store.dim}-d), "
+                             f"expected '{first.model_id}' ({first.dim}-d)")
+
+    # Dedup: an id found in several fragments (e.g. a shard run with the wrong --shard)
+    # is taken from the shard that owns it, otherwise from the lowest shard
+    sources, manifest, duplicates = {}, {}, 0
+    for shard in sorted(stores, key=lambda shard: shard[0]):
+        fragment_manifest = load_manifest(fragment_paths(shard, shard_dir)[1])
+        ids = np.asarray(stores[shard].ids)
+        for row, (movie_id, owned) in enumerate(zip(ids.tolist(), shard_mask(ids, shard))):
+            if movie_id in sources:
+                duplicates += 1
+                if not owned or sources[movie_id][2]:
+                    continue
+            sources[movie_id] = (shard, row, owned)
+            manifest[str(movie_id)] = fragment_manifest.get(str(movie_id))
+
+    # Metadata order, as an unsharded run writes it; ids no longer in metadata are dropped
+    order = [int(movie_id) for movie_id in pd.read_csv(metadata_path, usecols=["id"])["id"]]
+    ids = list(dict.fromkeys(movie_id for movie_id in order if movie_id in sources))
+    dropped = len(sources) - len(ids)
+    shard_of = np.array([sources[movie_id][0][0] for movie_id in ids], dtype=np.int64)
+    row_of = np.array([sources[movie_id][1] for movie_id in ids], dtype=np.int64)
+    features = np.empty((len(ids), first.dim), dtype=first.dtype)
+    for shard, store in stores.items():
+        targets = np.flatnonzero(shard_of == shard[0])
+        features[targets] = store.features[row_of[targets]]
+    manifest = {str(movie_id): manifest[str(movie_id)] for movie_id in ids if manifest[str(movie_id)] is not None}
+
+    write_store(store_path, ids, features, first.model_id, dtype=first.dtype)
+    save_manifest(manifest, manifest_path)
+    if clean:
+        for shard, path in fragments.items():
+            for fragment_path in fragment_paths(shard, shard_dir)[:2]:
+                if os.path.exists(fragment_path):
+                    os.remove(fragment_path)
+    return {"shards": len(fragments), "vectors": len(ids), "duplicates": duplicates, "dropped": dropped,
+            "model_id": first.model_id}
+
+
+if __name__ == "__main__":  # python -m Scripts.feature_shards merge
+    parser = argparse.ArgumentParser(description="Merge sharded feature extraction into one store")
+    parser.add_argument("command", choices=["merge"])
+    parser.add_argument("--shard-dir", default=default_shard_dir)
+    parser.add_argument("--metadata", default=default_metadata_path)
+    parser.add_argument("--store", default=default_store_path)
+    parser.add_argument("--manifest", default=default_manifest_path)
+    parser.add_argument("--clean", action="store_true", help="delete the fragments after a successful merge")
+    args = parser.parse_args()
+
+    result = merge_fragments(args.shard_dir, args.metadata, args.store, args.manifest, args.clean)
+    print(f"✅ Merged {result['shards']} shards into {args.store}: {result['vectors']} vectors "
+          f"({result['model_id']}), {result['duplicates']} duplicate and {result['dropped']} stale ids skipped")
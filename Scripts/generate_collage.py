@@ -1,6 +1,8 @@
 import os
+import argparse
+from multiprocessing import Pool
 from PIL import Image, ImageFilter
-import random  
+import random
 
 # === Config ===
 POSTER_DIR = "Data/Posters"              # Folder with poster images
@@ -8,46 +10,88 @@ OUTPUT_PATH = "Assets/background.jpg"    # Output collage path
 POSTER_SIZE = (200, 300)                 # Size of each poster
 GRID_COLUMNS = 22                        # Number of columns in grid
 MAX_IMAGES = 220                         # Max number of images
+BLUR_RADIUS = 2                          # Gaussian blur over the whole collage
+SEED = 0                                 # Same seed, same collage
+
+# === Load one tile (runs in a worker process) ===
+def load_tile(task):
+    path, size = task
+    try:
+        img = Image.open(path)
+        img.draft("RGB", size)  # JPEG: decode at 1/2, 1/4 or 1/8 scale when that is still >= size
+        return img.convert("RGB").resize(size), None  # Open and resize
+    except Exception as e:
+        return None, f"⚠️ Error with {path}: {e}"  # Skip if error
+
+# === Output paths for extra resolutions ===
+def output_path_for(width, output_path=OUTPUT_PATH):
+    root, ext = os.path.splitext(output_path)
+    return f"{root}_{width}{ext}"  # e.g. Assets/background_1920.jpg
 
 # === Create collage ===
-def create_collage():
-    # Collect image paths (only jpg/png), limit to MAX_IMAGES
-    image_paths = [os.path.join(POSTER_DIR, f) for f in os.listdir(POSTER_DIR)
-                   if f.lower().endswith(('.jpg', '.png'))][:MAX_IMAGES]
-    random.shuffle(image_paths)  # Shuffle images
+def create_collage(poster_dir=POSTER_DIR, output_path=OUTPUT_PATH, poster_size=POSTER_SIZE,
+                   columns=GRID_COLUMNS, max_images=MAX_IMAGES, seed=SEED, widths=(),
+                   blur=BLUR_RADIUS, workers=None):
+    # Collect image paths (only jpg/png) in a fixed order, limit to max_images, shuffle with the seed
+    names = sorted(f for f in os.listdir(poster_dir) if f.lower().endswith(('.jpg', '.png')))
+    image_paths = [os.path.join(poster_dir, f) for f in names[:max_images]]
+    random.Random(seed).shuffle(image_paths)  # Shuffle images, reproducibly
 
     if not image_paths:  # Exit if no images
         print("❌ No images found in folder.")
         return
 
-    images = []
-    for path in image_paths:
-        try:
-            img = Image.open(path).resize(POSTER_SIZE)  # Open and resize
-            images.append(img)
-        except Exception as e:
-            print(f"⚠️ Error with {path}: {e}")  # Skip if error
+    # Empty collage (dark background) sized for every poster; cropped to the rows used
+    rows = (len(image_paths) + columns - 1) // columns
+    collage = Image.new('RGB', (poster_size[0] * columns, poster_size[1] * rows), color=(20, 20, 40))
 
-    # Calculate grid dimensions
-    rows = (len(images) + GRID_COLUMNS - 1) // GRID_COLUMNS
-    collage_width = POSTER_SIZE[0] * GRID_COLUMNS
-    collage_height = POSTER_SIZE[1] * rows
+    # Paste tiles as workers finish them, in shuffle order; failed posters leave no gap
+    index = 0
+    tasks = [(path, poster_size) for path in image_paths]
+    with Pool(workers) as pool:
+        for img, error in pool.imap(load_tile, tasks, chunksize=8):
+            if img is None:
+                print(error)
+                continue
+            x = (index % columns) * poster_size[0]
+            y = (index // columns) * poster_size[1]
+            collage.paste(img, (x, y))
+            index += 1
 
-    # Create empty collage (dark background)
-    collage = Image.new('RGB', (collage_width, collage_height), color=(20, 20, 40))
+    if index == 0:
+        print("❌ No readable images in folder.")
+        return
+    rows = (index + columns - 1) // columns
+    collage = collage.crop((0, 0, collage.width, poster_size[1] * rows))
 
-    # Paste each image into grid
-    for index, img in enumerate(images):
-        x = (index % GRID_COLUMNS) * POSTER_SIZE[0]
-        y = (index // GRID_COLUMNS) * POSTER_SIZE[1]
-        collage.paste(img, (x, y))
+    # Optional blur effect, once over the whole canvas so tile edges blend
+    if blur:
+        collage = collage.filter(ImageFilter.GaussianBlur(blur))
 
-    # Optional blur effect
-    collage = collage.filter(ImageFilter.GaussianBlur(2))
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)  # Ensure output folder
+    collage.save(output_path)  # Save collage
+    print(f"✅ Collage saved at: {output_path} ({collage.width}x{collage.height}, {index} posters)")
 
-    os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)  # Ensure output folder
-    collage.save(OUTPUT_PATH)  # Save collage
-    print(f"✅ Collage saved at: {OUTPUT_PATH} ({collage_width}x{collage_height})")
+    # Smaller copies, e.g. for lower-resolution screens
+    for width in widths:
+        height = max(1, round(collage.height * width / collage.width))
+        path = output_path_for(width, output_path)
+        collage.resize((width, height), Image.LANCZOS, reducing_gap=3.0).save(path)
+        print(f"✅ Collage saved at: {path} ({width}x{height})")
 
 if __name__ == "__main__":  # Run if executed directly
-    create_collage()
+    parser = argparse.ArgumentParser(description="Build the poster collage used as GUI background")
+    parser.add_argument("--poster-dir", default=POSTER_DIR)
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--columns", type=int, default=GRID_COLUMNS)
+    parser.add_argument("--max-images", type=int, default=MAX_IMAGES, help="posters in the grid")
+    parser.add_argument("--tile", default=f"{POSTER_SIZE[0]}x{POSTER_SIZE[1]}", help="poster size, WxH")
+    parser.add_argument("--widths", type=int, nargs="*", default=[], help="extra output widths, e.g. 1920 1280")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--blur", type=float, default=BLUR_RADIUS, help="0 disables the blur")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    args = parser.parse_args()
+
+    tile = tuple(int(v) for v in args.tile.lower().split("x"))
+    create_collage(args.poster_dir, args.output, tile, args.columns, args.max_images, args.seed,
+                   args.widths, args.blur, args.workers)
@@ -0,0 +1,100 @@
+import os  # File system
+import json  # Results
+import time  # Latency
+import random  # Request mix
+import argparse  # Command line
+import http.client  # HTTP client
+import numpy as np  # Percentiles
+from concurrent.futures import ThreadPoolExecutor  # Concurrent clients
+
+# Local load generator for Scripts.server: N concurrent clients with
+# keep-alive connections send /recognize uploads from Data/Posters (or
+# /recommend lookups) and report latency percentiles and throughput.
+#
+# The uploads are exact catalogue posters, so by default the server answers them
+# from the perceptual-hash prefilter and, after the first request per poster, from
+# the recognition cache. To measure the CNN micro-batcher, start the server with
+# both shortcuts off:
+#
+#   python -m Scripts.server --no-prefilter --cache-size 0
+
+POSTER_DIR = "Data/Posters"
+
+
+def load_posters(poster_dir, limit, seed):
+    names = sorted(f for f in os.listdir(poster_dir) if f.lower().endswith((".jpg", ".png")))
+    random.Random(seed).shuffle(names)
+    posters = []
+    for name in names[:limit]:
+        with open(os.path.join(poster_dir, name), "rb") as fh:
+            posters.append((int(os.path.splitext(name)[0]), fh.read()))
+    return posters
+
+
+def run_client(host, port, mode, posters, n_requests, seed):
+    # One keep-alive connection; returns (latencies in seconds, errors, correct matches)
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection(host, port, timeout=60)
+    latencies, errors, correct = [], 0, 0
+    for _ in range(n_requests):
+        movie_id, data = rng.choice(posters)
+        start = time.perf_counter()
+        try:
+            if mode == "recognize":
+                connection.request("POST", "/recognize?top_k=1", body=data,
+                                   headers={"Content-Type": "image/jpeg"})
+            else:
+                connection.request("GET", f"/recommend/{movie_id}")
+            response = connection.getresponse()
+            payload = json.loads(response.read())
+            latencies.append(time.perf_counter() - start)
+            if response.status != 200:
+                errors += 1
+            elif mode == "recognize" and payload["candidates"] and payload["candidates"][0]["id"] == movie_id:
+                correct += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=60)
+    connection.close()
+    return latencies, errors, correct
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the recommendation server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--mode", choices=["recognize", "recommend"], default="recognize")
+    parser.add_argument("--concurrency", type=int, default=8, help="parallel clients")
+    parser.add_argument("--requests", type=int, default=50, help="requests per client")
+    parser.add_argument("--posters", type=int, default=100, help="distinct posters to send")
+    parser.add_argument("--poster-dir", default=POSTER_DIR)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    posters = load_posters(args.poster_dir, args.posters, args.seed)
+    print(f"🔥 {args.concurrency} clients x {args.requests} {args.mode} requests -> {args.host}:{args.port}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        runs = list(pool.map(lambda i: run_client(args.host, args.port, args.mode, posters,
+                                                  args.requests, args.seed + i),
+                             range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([latency for run in runs for latency in run[0]]) * 1000
+    errors = sum(run[1] for run in runs)
+    correct = sum(run[2] for run in runs)
+    if len(latencies) == 0:
+        print("❌ No successful requests")
+        return
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"⏱️ p50 {p50:.1f} ms   p95 {p95:.1f} ms   p99 {p99:.1f} ms   max {latencies.max():.1f} ms")
+    print(f"⚡ {len(latencies) / elapsed:.1f} requests/s over {elapsed:.1f}s, {errors} errors")
+    if args.mode == "recognize":
+        print(f"🎯 top-1 correct: {correct}/{len(latencies)}")
+
+
+if __name__ == "__main__":  # python -m Scripts.loadgen
+    main()
@@ -0,0 +1,64 @@
+import os  # File system
+import time  # Load timing
+import argparse  # Command line
+import numpy as np  # Numeric operations
+import pandas as pd  # Data handling
+
+# Typed, columnar copy of metadata.csv (Data/metadata.parquet) so the recommender
+# does not re-parse text on every start. build_metadata.py writes it next to the
+# CSV; a copy older than the CSV is ignored.
+
+
+def columnar_path_for(metadata_path):
+    return os.path.splitext(metadata_path)[0] + ".parquet"
+
+
+def write_columnar(metadata, path):
+    tmp_path = path + ".tmp"
+    metadata.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def read_columnar(path):
+    metadata = pd.read_parquet(path)
+    for column in metadata.columns[metadata.dtypes == object]:
+        metadata[column] = metadata[column].where(metadata[column].notna(), np.nan)  # None -> NaN, as read_csv
+    return metadata
+
+
+def fresh(path, metadata_path):
+    return (os.path.exists(path)
+            and (not os.path.exists(metadata_path) or os.path.getmtime(path) >= os.path.getmtime(metadata_path)))
+
+
+def load_metadata(metadata_path):
+    # Parquet copy when it is up to date with the CSV, the CSV itself otherwise
+    path = columnar_path_for(metadata_path)
+    if fresh(path, metadata_path):
+        return read_columnar(path)
+    return pd.read_csv(metadata_path)
+
+
+def row_index(ids):
+    # movie ID -> row, first occurrence wins (as the old boolean-mask lookup did)
+    ids = pd.Series(ids)
+    first = ~ids.duplicated().to_numpy()
+    return dict(zip(ids[first].tolist(), np.flatnonzero(first).tolist()))
+
+
+if __name__ == "__main__":  # python -m Scripts.metadata_store: convert metadata.csv, compare load times
+    parser = argparse.ArgumentParser(description="Write the Parquet copy of metadata.csv")
+    parser.add_argument("metadata", nargs="?", default="Data/metadata.csv")
+    args = parser.parse_args()
+    path = columnar_path_for(args.metadata)
+
+    start = time.perf_counter()
+    metadata = pd.read_csv(args.metadata)
+    csv_time = time.perf_counter() - start
+    write_columnar(metadata, path)
+
+    start = time.perf_counter()
+    loaded = read_columnar(path)
+    columnar_time = time.perf_counter() - start
+    assert loaded.equals(metadata), "columnar copy differs from the CSV"
+    print(f"💾 {path}: {len(loaded)} movies, load {columnar_time * 1000:.1f} ms vs read_csv {csv_time * 1000:.1f} ms")
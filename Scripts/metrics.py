@@ -0,0 +1,164 @@
+import json  # Dumps and log lines
+import time  # Span timing
+import logging  # Per-request log lines
+import threading  # Shared counters, per-thread request context
+
+logger = logging.getLogger(__name__)
+
+# Timing spans and counters for the recognize / recommend hot paths.
+#
+#   metrics = Metrics(enabled=True)
+#   recommender = ContentBasedRecommender(metrics=metrics)
+#   ...
+#   metrics.stats()          # {"spans": {...}, "counters": {...}}
+#   metrics.to_prometheus()  # text exposition format, e.g. for GET /metrics
+#
+#   with metrics.request("recommend", movie_id=42) as request:
+#       with metrics.span("candidates"): ...
+#       request.note(results=5)
+#
+# Spans opened inside a request (find_best_match, recommend, ...) are also
+# collected per request and logged as one JSON line on the "Scripts.metrics"
+# logger at INFO level. Disabled metrics hand out a shared no-op span, so an
+# instrumented call costs one attribute lookup and an empty with-block.
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def note(self, **fields):
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _Request:
+    __slots__ = ("metrics", "kind", "fields", "spans", "start", "outer")
+
+    def __init__(self, metrics, kind, fields):
+        self.metrics = metrics
+        self.kind = kind
+        self.fields = fields  # Extra keys for the log line
+        self.spans = {}
+
+    def note(self, **fields):
+        # Add keys to the log line while the request runs (e.g. the matched movie)
+        self.fields.update(fields)
+
+    def __enter__(self):
+        local = self.metrics.local
+        self.outer = getattr(local, "request", None)
+        if self.outer is None:  # Nested calls (find_best_match -> find_matches) join the outer request
+            local.request = self
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        if self.outer is not None:
+            return False
+        self.metrics.local.request = None
+        self.metrics.observe(f"{self.kind}.total", elapsed, in_request=False)
+        self.metrics.count(f"{self.kind}.requests")
+        if exc_type is not None:
+            self.metrics.count(f"{self.kind}.errors")
+        if self.metrics.log_requests and logger.isEnabledFor(logging.INFO):
+            line = {"event": self.kind, "ms": round(elapsed * 1000, 3),
+                    "spans": {name: round(seconds * 1000, 3) for name, seconds in self.spans.items()}}
+            line.update(self.fields)
+            if exc_type is not None:
+                line["error"] = repr(exc)
+            logger.info(json.dumps(line, default=str))
+        return False
+
+
+class Metrics:
+    def __init__(self, enabled=False, log_requests=True):
+        self.enabled = enabled
+        self.log_requests = log_requests  # One JSON line per outermost request
+        self.lock = threading.Lock()
+        self.local = threading.local()  # Request being timed on this thread
+        self.spans = {}  # name -> [count, total seconds, max seconds]
+        self.counters = {}
+
+    def span(self, name):
+        # with metrics.span("forward"): ...
+        return _Span(self, name) if self.enabled else NO_SPAN
+
+    def request(self, kind, **fields):
+        return _Request(self, kind, fields) if self.enabled else NO_SPAN
+
+    def observe(self, name, seconds, in_request=True):
+        with self.lock:
+            entry = self.spans.get(name)
+            if entry is None:
+                self.spans[name] = [1, seconds, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+                entry[2] = max(entry[2], seconds)
+        request = getattr(self.local, "request", None) if in_request else None
+        if request is not None:
+            request.spans[name] = request.spans.get(name, 0.0) + seconds
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def reset(self):
+        with self.lock:
+            self.spans.clear()
+            self.counters.clear()
+
+    def stats(self):
+        with self.lock:
+            spans = {name: {"count": count, "total_ms": total * 1000, "mean_ms": total * 1000 / count,
+                            "max_ms": longest * 1000}
+                     for name, (count, total, longest) in sorted(self.spans.items())}
+            return {"spans": spans, "counters": dict(sorted(self.counters.items()))}
+
+    def to_json(self):
+        return json.dumps(self.stats(), indent=2)
+
+    def to_prometheus(self, prefix="recommender"):
+        # Summary-style count/sum per span plus max, and one counter per name
+        stats = self.stats()
+        lines = [f"# TYPE {prefix}_span_seconds summary"]
+        for name, span in stats["spans"].items():
+            lines.append(f'{prefix}_span_seconds_count{{span="{name}"}} {span["count"]}')
+            lines.append(f'{prefix}_span_seconds_sum{{span="{name}"}} {span["total_ms"] / 1000:.6f}')
+        lines.append(f"# TYPE {prefix}_span_max_seconds gauge")
+        for name, span in stats["spans"].items():
+            lines.append(f'{prefix}_span_max_seconds{{span="{name}"}} {span["max_ms"] / 1000:.6f}')
+        lines.append(f"# TYPE {prefix}_events_total counter")
+        for name, value in stats["counters"].items():
+            lines.append(f'{prefix}_events_total{{event="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+DISABLED = Metrics(enabled=False)  # Default for recommenders built without metrics
@@ -0,0 +1,216 @@
+import os  # File system
+import time  # Benchmark timing
+import argparse  # Command line
+import tempfile  # Benchmark queries
+from multiprocessing import Pool  # Hashing the catalogue
+import numpy as np  # Hashes and lookups
+import pandas as pd  # Poster paths
+from PIL import Image  # Decoding
+from .embedding_store import EmbeddingStore, default_store_path
+
+# Perceptual-hash prefilter: a 64-bit dHash (or pHash) of every catalogue poster,
+# built next to features.emb and keyed on its fingerprint. A query whose hash is
+# within `max_distance` bits of exactly one poster is a straight copy or a light
+# re-encode of it, and reuses that poster's stored vector instead of running the
+# CNN. Anything else (crops, photos, several close posters) falls through.
+#
+# Lookups use multi-index hashing: the 64 bits are split into max_distance + 1
+# bands, so any hash within max_distance bits agrees exactly with the query on at
+# least one band. Each band is a sorted array searched with np.searchsorted, and
+# only the rows sharing a band are compared bit by bit.
+#
+#   python -m Scripts.phash_index build [--method dhash|phash]
+#   python -m Scripts.phash_index bench --queries 100
+
+default_phash_path = "features.phash.npz"
+default_metadata_path = "Data/metadata.csv"
+HASH_SIZE = 8  # 8x8 bits
+MAX_DISTANCE = 4  # Hamming bits still counted as the same poster
+METHODS = ("dhash", "phash")
+
+
+def pack_bits(bits):
+    return np.packbits(bits.ravel()).view(">u8")[0].astype(np.uint64)
+
+
+def dhash(image):
+    # Sign of the horizontal gradient on a 9x8 grayscale thumbnail
+    pixels = np.asarray(image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS), dtype=np.int16)
+    return pack_bits(pixels[:, 1:] > pixels[:, :-1])
+
+
+def phash(image):
+    # Low-frequency DCT coefficients of a 32x32 thumbnail against their median
+    from scipy.fft import dctn  # Only needed for pHash
+    pixels = np.asarray(image.convert("L").resize((HASH_SIZE * 4, HASH_SIZE * 4), Image.LANCZOS), dtype=np.float64)
+    low = dctn(pixels, norm="ortho")[:HASH_SIZE, :HASH_SIZE]
+    return pack_bits(low > np.median(low.ravel()[1:]))  # DC term left out of the median
+
+
+def hash_image(image, method="dhash"):
+    return dhash(image) if method == "dhash" else phash(image)
+
+
+def hash_file(task):
+    # Worker: (path, method) -> hash or None. Full-size decode, as queries are decoded
+    # for the CNN: a reduced-scale draft() decode shifts the hash by a few bits
+    path, method = task
+    try:
+        with Image.open(path) as image:
+            return hash_image(image, method)
+    except Exception:
+        return None
+
+
+def popcount(values):
+    # Set bits of each uint64; np.bitwise_count needs NumPy >= 2.0
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return np.unpackbits(values.view(np.uint8)).reshape(-1, 64).sum(axis=1)
+
+
+def hamming(hashes, value):
+    return popcount(hashes ^ np.uint64(value))
+
+
+def band_bounds(max_distance):
+    # max_distance + 1 disjoint bit ranges covering all 64 bits
+    edges = np.linspace(0, 64, max_distance + 2).astype(int)
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def band_values(hashes, lo, hi):
+    return (np.asarray(hashes, dtype=np.uint64) >> np.uint64(lo)) & np.uint64((1 << (hi - lo)) - 1)
+
+
+class PHashIndex:
+    def __init__(self, ids, hashes, method="dhash", max_distance=MAX_DISTANCE):
+        self.ids = ids  # Row -> movie ID
+        self.hashes = hashes  # Row -> 64-bit hash
+        self.method = method
+        self.max_distance = max_distance
+        self.bands = []  # (lo, hi, sorted band values, rows in that order)
+        for lo, hi in band_bounds(max_distance):
+            values = band_values(hashes, lo, hi)
+            order = np.argsort(values, kind="stable")
+            self.bands.append((lo, hi, values[order], order))
+
+    @classmethod
+    def build(cls, ids, paths, method="dhash", workers=None, max_distance=MAX_DISTANCE):
+        # Hash every poster in parallel; unreadable posters are left out
+        if method not in METHODS:
+            raise ValueError(f"Unknown hash method '{method}'")
+        with Pool(workers) as pool:
+            values = pool.map(hash_file, [(path, method) for path in paths], chunksize=64)
+        keep = [i for i, value in enumerate(values) if value is not None]
+        hashes = np.array([values[i] for i in keep], dtype=np.uint64)
+        return cls(np.asarray(ids, dtype=np.int64)[keep], hashes, method, max_distance)
+
+    def save(self, path, fingerprint):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as fh:
+            np.savez(fh, ids=self.ids, hashes=self.hashes, method=np.array(self.method),
+                     fingerprint=np.array(fingerprint))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, fingerprint, max_distance=MAX_DISTANCE):
+        # None if the index is missing or was built for another version of the store
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            if str(data["fingerprint"]) != fingerprint:
+                return None
+            return cls(data["ids"], data["hashes"], str(data["method"]), max_distance)
+
+    def lookup(self, value):
+        # (rows, distances) of every poster within max_distance bits
+        value = np.uint64(value)
+        candidates = []
+        for lo, hi, keys, order in self.bands:
+            key = band_values(value, lo, hi)
+            start, stop = np.searchsorted(keys, key, "left"), np.searchsorted(keys, key, "right")
+            candidates.append(order[start:stop])
+        rows = np.unique(np.concatenate(candidates))
+        distances = hamming(self.hashes[rows], value)
+        close = distances <= self.max_distance
+        return rows[close], distances[close]
+
+    def match(self, value):
+        # Row of the one poster within max_distance, None when there are none or several
+        if value == 0 or value == np.uint64(2 ** 64 - 1):  # Flat image, no structure to compare
+            return None
+        rows, _ = self.lookup(value)
+        return int(rows[0]) if len(rows) == 1 else None
+
+
+def build_for_store(store, metadata_path=default_metadata_path, method="dhash", workers=None):
+    # Posters of every movie that has a stored vector
+    metadata = pd.read_csv(metadata_path, usecols=["id", "poster_path"])
+    metadata = metadata[[movie_id in store for movie_id in metadata["id"]]]
+    return PHashIndex.build(metadata["id"].to_numpy(), metadata["poster_path"].tolist(), method, workers)
+
+
+def benchmark(index, store_path=default_store_path, metadata_path=default_metadata_path, n_queries=100,
+              seed=0, cnn=True):
+    # Bypass rate, wrong bypasses and hash cost per perturbation, against the CNN cost per poster
+    from .benchmark import make_queries  # Perturbed copies of real posters
+    store = EmbeddingStore(store_path)
+    metadata = pd.read_csv(metadata_path, usecols=["id", "poster_path"])
+    id_of = np.asarray(index.ids)
+    with tempfile.TemporaryDirectory() as workdir:
+        queries = make_queries(metadata, store, workdir, n_queries, seed)
+        cnn_ms = None
+        if cnn:
+            from .recommender import ContentBasedRecommender  # torch is imported lazily
+            recommender = ContentBasedRecommender(metadata_path, store_path, lazy_model=True, prefilter=False)
+            paths = [path for _, path in queries["original"][:8]]
+            recommender.extract_visual_features_batch(paths[:1])  # Warm-up
+            start = time.perf_counter()
+            for path in paths:
+                recommender.extract_visual_features_batch([path])
+            cnn_ms = (time.perf_counter() - start) * 1000 / max(len(paths), 1)
+            print(f"🧠 CNN path: {cnn_ms:.1f} ms/poster (decode + forward)")
+
+        for kind, items in queries.items():
+            bypass = wrong = 0
+            start = time.perf_counter()
+            for movie_id, path in items:
+                with Image.open(path) as image:
+                    image.load()
+                    row = index.match(hash_image(image, index.method))
+                if row is not None:
+                    bypass += 1
+                    wrong += int(id_of[row] != movie_id)
+            hash_ms = (time.perf_counter() - start) * 1000 / max(len(items), 1)
+            rate = bypass / max(len(items), 1)
+            saving = f", saves ~{rate * (cnn_ms - hash_ms):.1f} ms/query" if cnn_ms else ""
+            print(f"🔎 {kind:<9s} bypass {rate:6.1%}  wrong {wrong}  decode + hash {hash_ms:.2f} ms{saving}")
+
+
+if __name__ == "__main__":  # python -m Scripts.phash_index build|bench
+    parser = argparse.ArgumentParser(description="Build or benchmark the perceptual-hash poster prefilter")
+    parser.add_argument("command", choices=["build", "bench"])
+    parser.add_argument("--store", default=default_store_path, help="embedding store")
+    parser.add_argument("--metadata", default=default_metadata_path)
+    parser.add_argument("--index", default=default_phash_path, help="index file")
+    parser.add_argument("--method", choices=METHODS, default="dhash")
+    parser.add_argument("--workers", type=int, default=None, help="hashing processes (default: all cores)")
+    parser.add_argument("--queries", type=int, default=100, help="benchmark posters per perturbation")
+    parser.add_argument("--no-cnn", action="store_true", help="skip timing the CNN path")
+    args = parser.parse_args()
+
+    store = EmbeddingStore(args.store)
+    if args.command == "build":
+        start = time.perf_counter()
+        index = build_for_store(store, args.metadata, args.method, args.workers)
+        index.save(args.index, store.fingerprint)
+        print(f"✅ {index.method} index of {len(index.ids)} posters saved to {args.index} "
+              f"({time.perf_counter() - start:.1f}s)")
+    else:
+        index = PHashIndex.load(args.index, store.fingerprint)
+        if index is None:
+            print(f"⚠️ {args.index} missing or stale, building a temporary index...")
+            index = build_for_store(store, args.metadata, args.method, args.workers)
+        benchmark(index, args.store, args.metadata, args.queries, cnn=not args.no_cnn)
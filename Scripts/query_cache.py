@@ -0,0 +1,141 @@
+import os  # File system
+import shutil  # Stale namespace cleanup
+import json  # Namespace markers
+import hashlib  # Content and namespace hashes
+import threading  # Shared by the server's threads
+from collections import OrderedDict  # LRU order
+import numpy as np  # Embeddings and disk entries
+
+# Recognition results keyed by a hash of the poster bytes, so a popular poster
+# uploaded again skips decoding, the CNN and the catalogue scan.
+#
+#   key -> (embedding, [(movie ID, score), ...] best first)
+#
+# Entries live in a bounded in-memory LRU and, optionally, as one small .npz per
+# entry under `disk_dir/recognition-cache-v1/<namespace>/`, which survives restarts.
+# The namespace is a hash of the feature store fingerprint, the model id and the
+# search index, so rebuilding features.emb or switching model opens an empty cache.
+# Every namespace folder holds a marker with its generation (store fingerprint and
+# model). Opening the cache deletes only the namespaces whose marker names another
+# generation: servers with different index settings can share a cache dir, and
+# nothing the cache did not create is ever removed.
+
+CACHE_SIZE = 256  # Entries kept in memory (about 8 KB each for ResNet50 features)
+default_cache_dir = "Data/query_cache"
+CACHE_FOLDER = "recognition-cache-v1"  # Everything the disk tier writes lives in here
+MARKER = "namespace.json"
+
+
+def content_key(data):
+    # Same hash as the feature manifest uses for posters
+    return hashlib.sha1(data).hexdigest()
+
+
+def namespace_for(*parts):
+    return hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:16]
+
+
+class RecognitionCache:
+    def __init__(self, namespace, max_entries=CACHE_SIZE, disk_dir=None, generation=None):
+        self.namespace = namespace
+        self.generation = generation  # Store fingerprint and model; stale generations are pruned
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (embedding, candidates), least recently used first
+        self.lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = 0
+        self.disk_dir = None
+        if disk_dir:
+            root = os.path.join(disk_dir, CACHE_FOLDER)
+            self.disk_dir = os.path.join(root, namespace)
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._write_marker()
+            if generation is not None:
+                self._prune(root)
+
+    def _write_marker(self):
+        with open(os.path.join(self.disk_dir, MARKER), "w", encoding="utf-8") as fh:
+            json.dump({"namespace": self.namespace, "generation": self.generation}, fh)
+
+    def _prune(self, root):
+        # Delete namespaces written for another store or model, identified by their marker
+        for name in os.listdir(root):
+            folder = os.path.join(root, name)
+            if name == self.namespace or not os.path.isdir(folder):
+                continue
+            try:
+                with open(os.path.join(folder, MARKER), "r", encoding="utf-8") as fh:
+                    marker = json.load(fh)
+            except (OSError, ValueError):  # Not a cache namespace
+                continue
+            if marker.get("namespace") == name and marker.get("generation") != self.generation:
+                shutil.rmtree(folder, ignore_errors=True)
+
+    def disk_path(self, key):
+        return os.path.join(self.disk_dir, key + ".npz")
+
+    def get(self, key):
+        # (embedding, candidates) or None; a disk hit is promoted to memory
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        entry = self._read(key) if self.disk_dir else None
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key, embedding, candidates):
+        entry = (np.asarray(embedding, dtype=np.float32), list(candidates))
+        with self.lock:
+            self._remember(key, entry)
+        if self.disk_dir:
+            self._write(key, entry)
+
+    def _remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _read(self, key):
+        try:
+            with np.load(self.disk_path(key)) as data:
+                candidates = [(int(movie_id), float(score)) for movie_id, score in zip(data["ids"], data["scores"])]
+                return data["embedding"], candidates
+        except (OSError, KeyError, ValueError):  # Missing or half-written entry
+            return None
+
+    def _write(self, key, entry):
+        embedding, candidates = entry
+        path = self.disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"  # Two threads may store the same poster
+        try:
+            with open(tmp_path, "wb") as fh:
+                np.savez(fh, embedding=embedding,
+                         ids=np.array([movie_id for movie_id, _ in candidates], dtype=np.int64),
+                         scores=np.array([score for _, score in candidates], dtype=np.float32))
+            os.replace(tmp_path, path)
+        except OSError:
+            pass  # The disk tier is best effort; memory still has the entry
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        if self.disk_dir:
+            shutil.rmtree(self.disk_dir, ignore_errors=True)
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._write_marker()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {"memory_hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                    "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                    "entries": len(self.entries)}
@@ -1,101 +1,345 @@
 import pandas as pd  # Data handling
 import numpy as np  # Numeric operations
-from sklearn.feature_extraction.text import TfidfVectorizer  # Text features
-from sklearn.metrics.pairwise import cosine_similarity  # Similarity measure
 from PIL import Image  # Image processing
 import os  # File system
-import torch  # Deep learning
-import torchvision.transforms as transforms  # Image transforms
-import torchvision.models as models  # Pretrained models
+import time  # Startup timing
+from .embedding_store import EmbeddingStore, normalize_rows, default_store_path  # Visual features
+from .embedding_engine import EmbeddingEngine, DEFAULT_BACKBONE, DEFAULT_BACKEND  # Poster CNN
+from .ann_index import load_index, default_index_path, DEFAULT_NPROBE  # Nearest-neighbour search
+from .compressed_index import default_compressed_path  # PCA + int8/PQ codes
+from .phash_index import PHashIndex, hash_image, default_phash_path  # Near-exact copies skip the CNN
+from .text_neighbors import (text_fingerprint, load_or_build, neighbors_path_for,  # Top-K text table
+                             unit_rows, DEFAULT_NEIGHBORS)
+from . import visual_neighbors  # Top-K poster table
+from .metadata_store import load_metadata, row_index  # Columnar metadata, id -> row
+from .feature_manifest import file_sha1  # Poster content hash
+from .query_cache import RecognitionCache, content_key, namespace_for, CACHE_SIZE  # Repeated uploads
+from .metrics import DISABLED  # Timing spans, off unless a Metrics is passed in
+from .tfidf_cache import load_or_fit, tfidf_path_for  # Persisted TF-IDF model
+
+# torch, torchvision, sklearn and scipy are imported where they are first
+# needed: together they take seconds to import, and a caller that only asks
+# for recommendations (or has not picked a poster yet) never pays for them.
 
 # Default metadata path
 default_metadata_path = "Data/metadata.csv"
 
-def image_transform():
-    # Define preprocessing for CNN input images
-    return transforms.Compose([
-        transforms.Resize((224, 224)),  # Resize to 224x224
-        transforms.ToTensor(),  # Convert to tensor
-        transforms.Normalize(mean=[0.485, 0.456, 0.406],  # Normalize
-                             std=[0.229, 0.224, 0.225])
-    ])
+# Text fields and their TF-IDF weights
+TEXT_FIELDS = [("genres", 2), ("description", 2.5), ("director", 2), ("cast", 0.5), ("studio", 1)]
+TFIDF_PARAMS = {"stop_words": "english", "max_features": 5000}
 
 class ContentBasedRecommender:
-    def __init__(self, metadata_path=default_metadata_path,
-                 features_path="features.npy", ids_path="ids.npy"):
-        self.metadata = pd.read_csv(metadata_path)  # Load metadata
+    def __init__(self, metadata_path=default_metadata_path, store_path=default_store_path,
+                 search_mode="auto", index_path=default_index_path, nprobe=DEFAULT_NPROBE,
+                 compressed_path=default_compressed_path, neighbors_k=DEFAULT_NEIGHBORS, lazy_model=False,
+                 metrics=None, cache_size=CACHE_SIZE, cache_dir=None, phash_path=default_phash_path,
+                 prefilter=True, backbone=DEFAULT_BACKBONE, backend=DEFAULT_BACKEND, threads=None, tfidf_path=None):
+        self.metrics = metrics if metrics is not None else DISABLED  # Scripts.metrics.Metrics
+        self.startup_timings = {}  # Seconds spent in each constructor phase
+        start = time.perf_counter()
+        self.metadata = load_metadata(metadata_path)  # Columnar copy if fresh, else the CSV
         # Drop rows missing required fields
         self.metadata = self.metadata.dropna(subset=["genres", "description", "cast", "studio", "director"])
+        self.metadata = self.metadata.reset_index(drop=True)  # Row labels == TF-IDF rows
+        self.movie_rows = row_index(self.metadata["id"])  # movie ID -> metadata row, O(1) lookups
+        self.startup_timings["metadata"] = time.perf_counter() - start
+
+        # Memory-mapped visual features; rejects vectors from another model or backend
+        self.engine = EmbeddingEngine(backbone, backend, threads)  # Built on first use, see load_model
+        self.store = EmbeddingStore(store_path, model_id=self.engine.engine_id, dim=self.engine.dim)
+        if self.store.normalized:
+            self.features = self.store.features  # Unit-length float32, shared read-only pages
+        else:
+            self.features = normalize_rows(self.store.features)  # Older store: normalize once, in RAM
+        self.ids = self.store.ids  # Row -> movie ID
+        # IVF or compressed index when a fresh one was built, exact scan otherwise
+        self.index = load_index(self.store, self.features, search_mode, index_path, nprobe,
+                                compressed_path)
+        # Top-K poster neighbours for hybrid recommendations, rebuilt only with the store
+        self.visual_neighbors_path = visual_neighbors.visual_neighbors_path_for(store_path)
+        self.visual_neighbors, _ = visual_neighbors.load_or_build(self.visual_neighbors_path, self.store,
+                                                                  self.features, self.index, neighbors_k)
+        # Perceptual hashes of the catalogue posters, when built for this store
+        self.phash = PHashIndex.load(phash_path, self.store.fingerprint) if prefilter else None
+        if self.phash is not None:
+            self._phash_store_rows = self.store.rows_of(self.phash.ids)
+        self.startup_timings["features"] = time.perf_counter() - start - sum(self.startup_timings.values())
+
+        # Recognition results by poster hash; a new store, model or index starts an empty cache
+        self.model_id = self.engine.engine_id
+        self.cache = None
+        if cache_size > 0:
+            namespace = namespace_for(self.store.fingerprint, self.model_id, type(self.index).__name__,
+                                      getattr(self.index, "nprobe", ""), getattr(self.index, "rerank", ""),
+                                      self.phash is not None)
+            generation = namespace_for(self.store.fingerprint, self.model_id)  # Other settings may share the dir
+            self.cache = RecognitionCache(namespace, cache_size, cache_dir, generation)
+
+        # CNN now, or on the first poster when lazy_model is set
+        self.model = None
+        if not lazy_model:
+            self.load_model()
 
-        self.features = np.load(features_path)  # Load visual features
-        self.ids = np.load(ids_path)  # Load IDs
+        # Fingerprint of the TF-IDF inputs keys both text caches
+        fingerprint = text_fingerprint(self.metadata, TEXT_FIELDS, TFIDF_PARAMS)
+        self._prepare_text_features(tfidf_path or tfidf_path_for(metadata_path), fingerprint)  # Load or build TF-IDF
 
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")  # Choose device
-        self.model = models.resnet50(weights=models.ResNet50_Weights.DEFAULT)  # Pretrained ResNet50
-        self.model = torch.nn.Sequential(*list(self.model.children())[:-1])  # Remove classifier layer
-        self.model.eval().to(self.device)  # Eval mode, move to device
+        # Top-K text neighbours, rebuilt only when the TF-IDF inputs change
+        self.neighbors_path = neighbors_path_for(metadata_path)
+        self.neighbors, self.neighbor_scores = load_or_build(self.neighbors_path, fingerprint,
+                                                             self.tfidf_matrix, neighbors_k)
+        self.tfidf_unit = unit_rows(self.tfidf_matrix)  # Cosine = dot product for hybrid scoring
 
-        self.transform = image_transform()  # Image preprocessing
+        # Metadata row <-> store row, and similarity baselines for calibration
+        self._store_rows = self.store.rows_of(self.metadata["id"].to_numpy())
+        self._metadata_rows = pd.Index(self.metadata["id"]).get_indexer(np.asarray(self.ids))
+        self.calibration = self._calibrate()
+        self.startup_timings["text"] = time.perf_counter() - start - sum(self.startup_timings.values())
 
-        self._prepare_text_features()  # Build TF-IDF features
+    def _prepare_text_features(self, tfidf_path, fingerprint):
+        # Weighted per-field TF-IDF, refitted only when the metadata text changed
+        self.tfidf_path = tfidf_path
+        self.tfidf_matrix, self.vocabularies = load_or_fit(self.tfidf_path, fingerprint, self.metadata,
+                                                           TEXT_FIELDS, TFIDF_PARAMS)
 
-    def _prepare_text_features(self):
-        from sklearn.feature_extraction.text import TfidfVectorizer
-        from scipy.sparse import hstack
+    def load_model(self):
+        # Import torch and build the CNN engine; later calls return at once
+        if self.model is not None:
+            return self.model
+        start = time.perf_counter()
+        self.model = self.engine.load()
+        self.startup_timings.setdefault("model", time.perf_counter() - start)
+        return self.model
 
-        vectorizer = TfidfVectorizer(stop_words="english", max_features=5000)
+    def embed_images(self, images):
+        # One forward pass for a list of PIL images -> (n, engine.dim) features
+        if not images:
+            return np.empty((0, self.engine.dim), dtype=np.float32)
+        self.load_model()
+        import torch  # Already loaded by the engine
+        with self.metrics.span("transform"):
+            batch = torch.stack([self.engine.transform(image.convert("RGB")) for image in images])  # Preprocess
+        with self.metrics.span("forward"):
+            return self.engine.forward(batch)  # Extract features
 
-        # Create TF-IDF for each metadata field with weights
-        tfidf_genres = vectorizer.fit_transform(self.metadata["genres"]) * 2
-        tfidf_desc = vectorizer.fit_transform(self.metadata["description"]) * 2.5
-        tfidf_director = vectorizer.fit_transform(self.metadata["director"]) * 2
-        tfidf_cast = vectorizer.fit_transform(self.metadata["cast"]) * 0.5
-        tfidf_studio = vectorizer.fit_transform(self.metadata["studio"]) * 1
+    def prefilter(self, images):
+        # Stored vector of the catalogue poster each image is a near-exact copy of, else None
+        if self.phash is None:
+            return [None] * len(images)
+        with self.metrics.span("phash"):
+            rows = [self.phash.match(hash_image(image, self.phash.method)) for image in images]
+        features = []
+        for row in rows:
+            self.metrics.count("phash.fallthrough" if row is None else "phash.bypass")
+            features.append(None if row is None else np.asarray(self.features[self._phash_store_rows[row]]))
+        return features
 
-        # Combine features into one sparse matrix
-        self.tfidf_matrix = hstack([tfidf_genres, tfidf_desc, tfidf_director, tfidf_cast, tfidf_studio])
+    def embed_posters(self, images):
+        # Features for decoded posters: the prefilter first, one CNN pass for the rest
+        features = self.prefilter(images)
+        todo = [i for i, feature in enumerate(features) if feature is None]
+        for i, feature in zip(todo, self.embed_images([images[i] for i in todo])):
+            features[i] = feature
+        return features
+
+    def load_images(self, image_paths):
+        # Decoded images and their positions in image_paths; unreadable files are skipped
+        images, valid = [], []
+        with self.metrics.span("decode"):
+            for i, image_path in enumerate(image_paths):
+                if not os.path.exists(image_path):  # Skip if missing
+                    self.metrics.count("decode.missing")
+                    continue
+                try:
+                    image = Image.open(image_path)  # Open image
+                    image.load()
+                    images.append(image)
+                    valid.append(i)
+                except Exception as e:
+                    self.metrics.count("decode.errors")
+                    print(f"Error processing image: {e}")
+        return images, valid
+
+    def extract_visual_features_batch(self, image_paths):
+        # One forward pass for all readable images; None for the others
+        images, valid = self.load_images(image_paths)
+        results = [None] * len(image_paths)
+        for i, feature in zip(valid, self.embed_images(images)):
+            results[i] = feature
+        return results
 
     def extract_visual_features(self, image_path):
-        if not os.path.exists(image_path):  # Skip if missing
-            return None
+        return self.extract_visual_features_batch([image_path])[0]
 
-        try:
-            image = Image.open(image_path).convert("RGB")  # Open image
-            image = self.transform(image).unsqueeze(0).to(self.device)  # Preprocess and send to device
+    def search(self, query_feats, top_k=5):
+        # Cosine top-k (rows, scores) for a (q, d) block of queries
+        with self.metrics.span("search"):
+            queries = normalize_rows(np.atleast_2d(query_feats))
+            return self.index.search(queries, min(top_k, len(self.ids)))
 
-            with torch.no_grad():  # Disable gradients
-                features = self.model(image).squeeze().cpu().numpy()  # Extract features
-            return features
-        except Exception as e:
-            print(f"Error processing image: {e}")
+    def cache_key(self, data=None, path=None):
+        # Content hash of poster bytes (or of a file), None when caching is off or unreadable
+        if self.cache is None:
             return None
+        with self.metrics.span("hash"):
+            try:
+                return content_key(data) if path is None else file_sha1(path)
+            except OSError:
+                return None
 
-    def find_best_match(self, image_path):
-        query_feat = self.extract_visual_features(image_path)  # Get features
-        if query_feat is None:
+    def cached_matches(self, key, top_k):
+        # Top-k candidates from the cache, or None; also the embedding for deeper searches
+        if key is None:
+            return None, None
+        entry = self.cache.get(key)
+        if entry is None:
+            self.metrics.count("cache.miss")
             return None, None
+        self.metrics.count("cache.hit")
+        embedding, candidates = entry
+        if len(candidates) >= min(top_k, len(self.ids)):
+            return candidates[:top_k], embedding
+        return None, embedding
 
-        query_feat = query_feat.reshape(1, -1)  # Reshape for sklearn
-        all_feats = self.features  # Precomputed features
+    def find_matches(self, image_paths, top_k=5):
+        # Top-k (movie ID, score) candidates per poster, best first; None if unreadable
+        with self.metrics.request("find_matches", posters=len(image_paths), top_k=top_k):
+            matches = [None] * len(image_paths)
+            if len(self.ids) == 0:
+                return matches
 
-        sims = cosine_similarity(query_feat, all_feats).flatten()  # Compute similarity
-        best_idx = np.argmax(sims)  # Best index
-        best_id = self.ids[best_idx]  # Best match ID
-        result = self.metadata[self.metadata["id"] == best_id]  # Metadata row
+            # Cached posters skip the CNN, and the search too when enough candidates are stored;
+            # near-exact copies of catalogue posters skip it through the perceptual-hash prefilter
+            keys = [self.cache_key(path=path) for path in image_paths]
+            query_feats = [None] * len(image_paths)
+            todo = []
+            for i, key in enumerate(keys):
+                matches[i], query_feats[i] = self.cached_matches(key, top_k)
+                if matches[i] is None and query_feats[i] is None:
+                    todo.append(i)
+            images, loaded = self.load_images([image_paths[i] for i in todo])
+            for j, feature in zip(loaded, self.embed_posters(images)):
+                query_feats[todo[j]] = feature
 
-        if result.empty:
-            return None, None
+            valid = [i for i, feat in enumerate(query_feats) if feat is not None and matches[i] is None]
+            if not valid:
+                return matches
 
-        return best_id, result.iloc[0]  # Return ID and metadata row
+            rows, scores = self.search(np.stack([query_feats[i] for i in valid]), top_k)
+            for i, row_ids, row_scores in zip(valid, rows, scores):
+                matches[i] = [(int(self.ids[r]), float(score)) for r, score in zip(row_ids, row_scores)]
+                if keys[i] is not None:
+                    self.cache.put(keys[i], query_feats[i], matches[i])
+            return matches
 
-    def recommend(self, movie_id, top_n=5, alpha=0.6):
-        if movie_id not in self.metadata["id"].values:  # Invalid ID
-            return []
+    def find_best_match(self, image_path):
+        with self.metrics.request("recognize", path=image_path) as request:
+            candidates = self.find_matches([image_path], top_k=1)[0]  # Best candidate
+            if not candidates:
+                self.metrics.count("recognize.no_match")
+                return None, None
+
+            best_id = candidates[0][0]  # Best match ID
+            result = self.get_movie(best_id)  # Metadata row
 
-        idx = self.metadata.index[self.metadata["id"] == movie_id][0]  # Get index
+            if result is None:
+                return None, None
 
-        # Compute cosine similarity on text features
+            request.note(movie_id=best_id, score=round(candidates[0][1], 4))
+            return best_id, result  # Return ID and metadata row
+
+    def get_movie(self, movie_id):
+        # Metadata row of a movie, or None if unknown
+        with self.metrics.span("lookup"):
+            row = self.movie_rows.get(movie_id)
+            return None if row is None else self.metadata.iloc[row]
+
+    def _calibrate(self, n_pairs=2000, seed=0):
+        # Mean and spread of each modality's similarity between random movie pairs.
+        # Scores are z-scored against these, so alpha weighs "how unusually similar"
+        # in both modalities the same way whatever the catalogue size.
+        rng = np.random.default_rng(seed)
+        n = len(self.metadata)
+        a, b = rng.integers(0, max(n, 1), n_pairs), rng.integers(0, max(n, 1), n_pairs)
+        pairs = a != b
+        a, b = a[pairs], b[pairs]
+
+        text = np.asarray(self.tfidf_unit[a].multiply(self.tfidf_unit[b]).sum(axis=1)).ravel()
+        rows_a, rows_b = self._store_rows[a], self._store_rows[b]
+        both = (rows_a >= 0) & (rows_b >= 0)
+        visual = np.einsum("ij,ij->i", np.asarray(self.features[rows_a[both]]),
+                           np.asarray(self.features[rows_b[both]]))
+
+        def stats(values):
+            if len(values) < 2:
+                return 0.0, 1.0
+            return float(values.mean()), max(float(values.std()), 1e-6)
+
+        return {"text": stats(text), "visual": stats(visual)}
+
+    def _text_candidates(self, idx, k):
+        if k <= self.neighbors.shape[1]:  # Precomputed neighbours: O(1) lookup
+            candidates = self.neighbors[idx, :k]
+            return candidates[candidates >= 0]
+        # Deeper than the table: compute cosine similarity on text features
+        from sklearn.metrics.pairwise import cosine_similarity  # Similarity measure
         cosine_sim = cosine_similarity(self.tfidf_matrix[idx], self.tfidf_matrix).flatten()
-        similar_indices = cosine_sim.argsort()[::-1][1:top_n+1]  # Get top N similar
+        order = np.argsort(-cosine_sim, kind="stable")
+        return order[order != idx][:k]  # Exclude the movie itself
+
+    def recommend(self, movie_id, top_n=5, alpha=0.6):
+        # alpha weighs text similarity, (1 - alpha) poster similarity; alpha=1 is text-only
+        with self.metrics.request("recommend", movie_id=movie_id, top_n=top_n, alpha=alpha) as request:
+            top_n = max(int(top_n), 0)  # A negative count would slice from the end
+            idx = self.movie_rows.get(movie_id)  # Metadata row
+            if idx is None:  # Invalid ID
+                self.metrics.count("recommend.unknown_id")
+                return []
+
+            best = self._recommend_rows(idx, top_n, alpha)
+            with self.metrics.span("lookup"):
+                result = self.metadata.iloc[best]  # Return recommendations
+            request.note(results=len(result))
+            return result
+
+    def _recommend_rows(self, idx, top_n, alpha):
+        # Metadata rows of the top_n recommendations for metadata row idx
+        if alpha >= 1:
+            with self.metrics.span("text_candidates"):
+                return self._text_candidates(idx, top_n)
+
+        # Candidates: the best of each modality, never a full dense scan of both
+        k = max(top_n, self.neighbors.shape[1])
+        with self.metrics.span("text_candidates"):
+            candidates = [self._text_candidates(idx, k)]
+        store_row = self._store_rows[idx]
+        query = np.asarray(self.features[store_row]) if store_row >= 0 else None
+        if query is not None:
+            with self.metrics.span("visual_candidates"):
+                if k <= self.visual_neighbors.shape[1]:  # Precomputed neighbours: O(1) lookup
+                    rows = self.visual_neighbors[store_row, :k]
+                    rows = rows[rows >= 0]
+                else:  # Deeper than the table: search the index
+                    rows, _ = self.index.search(query[None, :], min(k + 1, len(self.ids)))
+                    rows = rows[0]
+                candidates.append(self._metadata_rows[rows])
+        candidates = np.unique(np.concatenate(candidates))
+        candidates = candidates[(candidates >= 0) & (candidates != idx)]
+        if len(candidates) == 0:
+            return candidates
+
+        # Exact similarities on the candidate set only, z-scored per modality
+        with self.metrics.span("score"):
+            text_mean, text_std = self.calibration["text"]
+            text_sim = (self.tfidf_unit[candidates] @ self.tfidf_unit[idx].T).toarray().ravel()
+            text_z = (text_sim - text_mean) / text_std
+
+            visual_z = np.zeros(len(candidates))  # Missing poster: average visual similarity
+            rows = self._store_rows[candidates]
+            if query is not None and (rows >= 0).any():
+                visual_mean, visual_std = self.calibration["visual"]
+                visual_sim = np.asarray(self.features[rows[rows >= 0]]) @ query
+                visual_z[rows >= 0] = (visual_sim - visual_mean) / visual_std
 
-        return self.metadata.iloc[similar_indices]  # Return recommendations
+            fused = alpha * text_z + (1 - alpha) * visual_z
+            return candidates[np.argsort(-fused, kind="stable")[:top_n]]
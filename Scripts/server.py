@@ -0,0 +1,329 @@
+import io  # In-memory uploads
+import json  # Response format
+import math  # NaN handling
+import asyncio  # Event loop
+import logging  # Per-request log lines
+import argparse  # Command line
+import traceback  # Error logging
+from email import policy  # Modern message API
+from email.parser import BytesParser  # multipart/form-data uploads
+from urllib.parse import urlsplit, parse_qs  # Query strings
+from concurrent.futures import ThreadPoolExecutor  # Model and decode threads
+import numpy as np  # Feature batches
+from PIL import Image  # Image decoding
+from .metrics import Metrics  # Timing spans and counters
+from .query_cache import CACHE_SIZE  # Recognition cache default
+from .embedding_engine import BACKBONES, BACKENDS, DEFAULT_BACKBONE, DEFAULT_BACKEND  # CNN choices
+from .recommender import ContentBasedRecommender  # Recognition and recommendation
+
+# Long-lived recommendation service: one process loads ResNet50, the
+# embedding store and the TF-IDF model once and serves every client.
+#
+#   POST /recognize[?top_k=5]          body: poster bytes (raw or multipart)
+#   GET  /recommend/{id}[?top_n=5&alpha=0.6]
+#   GET  /health
+#   GET  /metrics[?format=json]        span timings and counters (with --metrics)
+#
+# top_k and top_n must be in 1..MAX_RESULTS and alpha in [0, 1], else 400.
+#
+# Concurrent /recognize requests are coalesced into micro-batches: the
+# batcher waits at most `max_wait_ms` for up to `max_batch` posters and
+# runs them through the CNN and the similarity search in one call.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+MAX_BATCH = 16  # Posters per forward pass
+MAX_WAIT_MS = 10  # Longest a request waits for others to join its batch
+MAX_BODY = 20 * 1024 * 1024  # Largest accepted upload
+MAX_RESULTS = 100  # Largest top_k / top_n a client may ask for
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class MicroBatcher:
+    def __init__(self, process_batch, executor, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.process_batch = process_batch  # list of items -> list of results, runs in `executor`
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]  # Block until the first request arrives
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.process_batch, items)
+            except Exception as e:
+                results = [e] * len(batch)
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), result in zip(batch, results):
+                if future.done():  # Client went away
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+def movie_to_json(row):
+    # Metadata row -> plain JSON types (NaN becomes null)
+    movie = {}
+    for key, value in row.to_dict().items():
+        if hasattr(value, "item"):
+            value = value.item()
+        if isinstance(value, float) and math.isnan(value):
+            value = None
+        movie[key] = value
+    return movie
+
+
+def query_value(query, name, default, cast, valid=None, expected=""):
+    # Typed query-string parameter; malformed or out-of-range values are the client's fault
+    try:
+        value = cast(query.get(name, [default])[0])
+    except ValueError:
+        raise HttpError(400, f"Invalid value for '{name}'")
+    if valid is not None and not valid(value):  # NaN fails every comparison
+        raise HttpError(400, f"Invalid value for '{name}', expected {expected}")
+    return value
+
+
+def result_count(query, name):
+    return query_value(query, name, 5, int, lambda n: 0 < n <= MAX_RESULTS, f"1..{MAX_RESULTS}")
+
+
+def upload_bytes(body, content_type):
+    # Raw image bytes, or the first file part of a multipart/form-data body
+    if content_type.startswith("multipart/form-data"):
+        head = b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n"
+        message = BytesParser(policy=policy.default).parsebytes(head + body)
+        for part in message.iter_parts():
+            if part.get_filename() or part.get_content_maintype() == "image":
+                body = part.get_payload(decode=True)
+                break
+        else:
+            raise HttpError(400, "No file part in upload")
+    return body
+
+
+def decode_upload(data):
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+        return image.convert("RGB")
+    except Exception as e:
+        raise HttpError(400, f"Unreadable image: {e}")
+
+
+class RecommendationServer:
+    def __init__(self, recommender, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.recommender = recommender
+        self.model_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model")  # One CNN at a time
+        self.io_executor = ThreadPoolExecutor(thread_name_prefix="decode")
+        self.batcher = MicroBatcher(self._recognize_batch, self.model_executor, max_batch, max_wait_ms)
+
+    def _recognize_batch(self, items):
+        # items: (image, top_k, cache key); one forward pass and one matrix-matrix search for all
+        images = [image for image, _, _ in items]
+        top_k = max(k for _, k, _ in items)
+        with self.recommender.metrics.request("recognize_batch", batch=len(items)):
+            features = self.recommender.embed_posters(images)
+            rows, scores = self.recommender.search(np.stack(features), top_k)
+        results = []
+        for (_, k, key), feature, row_ids, row_scores in zip(items, features, rows, scores):
+            candidates = [(int(self.recommender.ids[r]), float(score)) for r, score in zip(row_ids, row_scores)]
+            if key is not None:
+                self.recommender.cache.put(key, feature, candidates)
+            results.append((candidates[:k], len(items)))
+        return results
+
+    def _cache_lookup(self, data, top_k):
+        # Hash and (disk) cache reads stay off the event loop
+        key = self.recommender.cache_key(data)
+        return key, self.recommender.cached_matches(key, top_k)[0]
+
+    async def recognize(self, body, content_type, query):
+        loop = asyncio.get_running_loop()
+        top_k = result_count(query, "top_k")
+        data = await loop.run_in_executor(self.io_executor, upload_bytes, body, content_type)
+        key, candidates = await loop.run_in_executor(self.io_executor, self._cache_lookup, data, top_k)
+        batch_size = 0  # Served from the cache
+        if candidates is None:
+            image = await loop.run_in_executor(self.io_executor, decode_upload, data)
+            candidates, batch_size = await self.batcher.submit((image, top_k, key))
+        if not candidates:
+            raise HttpError(404, "Empty catalogue")
+
+        best = self.recommender.get_movie(candidates[0][0])
+        return {"match": movie_to_json(best) if best is not None else None,
+                "candidates": [{"id": movie_id, "score": score} for movie_id, score in candidates],
+                "batch_size": batch_size}
+
+    async def recommend(self, movie_id, query):
+        top_n = result_count(query, "top_n")
+        alpha = query_value(query, "alpha", 0.6, float, lambda a: 0 <= a <= 1, "a number in [0, 1]")
+        loop = asyncio.get_running_loop()
+        movies = await loop.run_in_executor(self.io_executor, self.recommender.recommend, movie_id, top_n, alpha)
+        if isinstance(movies, list):  # Unknown id
+            raise HttpError(404, f"Unknown movie id {movie_id}")
+        return {"id": movie_id, "recommendations": [movie_to_json(row) for _, row in movies.iterrows()]}
+
+    async def route(self, method, target, headers, body):
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        parts = [part for part in url.path.split("/") if part]
+
+        if parts == ["health"]:
+            return {"status": "ok", "movies": len(self.recommender.metadata),
+                    "batches": self.batcher.batches, "recognized": self.batcher.items,
+                    "cache": self.recommender.cache.stats() if self.recommender.cache else None}
+        if parts == ["metrics"]:
+            metrics = self.recommender.metrics
+            if not metrics.enabled:
+                raise HttpError(404, "Metrics are off; start the server with --metrics")
+            return metrics.stats() if query_value(query, "format", "prometheus", str) == "json" else metrics.to_prometheus()
+        if parts == ["recognize"]:
+            if method != "POST":
+                raise HttpError(405, "Use POST with the poster as body")
+            return await self.recognize(body, headers.get("content-type", ""), query)
+        if len(parts) == 2 and parts[0] == "recommend":
+            if method != "GET":
+                raise HttpError(405, "Use GET")
+            try:
+                movie_id = int(parts[1])
+            except ValueError:
+                raise HttpError(400, f"Invalid movie id '{parts[1]}'")
+            return await self.recommend(movie_id, query)
+        raise HttpError(404, f"No route for {url.path}")
+
+    async def handle(self, reader, writer):
+        # Minimal HTTP/1.1 with keep-alive; one request at a time per connection
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = None  # Stays None for a bad header: the body cannot be skipped, so the connection closes
+                try:
+                    value = headers.get("content-length", "0")
+                    if not (value.isascii() and value.isdigit()):  # No sign, spaces or junk
+                        raise HttpError(400, "Bad Content-Length")
+                    length = int(value)
+                    if length > MAX_BODY:
+                        raise HttpError(413, "Upload too large")
+                    if headers.get("expect", "").lower() == "100-continue":  # curl -F, large uploads
+                        writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+                        await writer.drain()
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload = 200, await self.route(method.upper(), target, headers, body)
+                except HttpError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    traceback.print_exc()
+                    status, payload = 500, {"error": str(e)}
+
+                keep_alive = (headers.get("connection", "").lower() != "close"
+                              and version.upper() == "HTTP/1.1" and status != 413 and length is not None)
+                if isinstance(payload, str):  # Prometheus text exposition
+                    content_type, data = "text/plain; version=0.0.4", payload.encode("utf-8")
+                else:
+                    content_type, data = "application/json", json.dumps(payload).encode("utf-8")
+                writer.write(f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                             f"Content-Type: {content_type}\r\n"
+                             f"Content-Length: {len(data)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        batcher_task = asyncio.create_task(self.batcher.run())
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"🌐 Serving on http://{host}:{port} (batch <= {self.batcher.max_batch}, "
+              f"wait <= {self.batcher.max_wait * 1000:.0f} ms)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher_task.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve poster recognition and recommendations over HTTP")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="posters per CNN batch")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS, help="batching deadline")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE, help="recognition results kept in memory (0 = off)")
+    parser.add_argument("--cache-dir", default=None, help="also keep them on disk, e.g. Data/query_cache")
+    parser.add_argument("--no-prefilter", action="store_true",
+                        help="send every poster through the CNN, even near-exact catalogue copies")
+    parser.add_argument("--backbone", choices=list(BACKBONES), default=DEFAULT_BACKBONE,
+                        help="must match the model features.emb was extracted with")
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND, help="CNN inference backend")
+    parser.add_argument("--threads", type=int, default=None, help="intra-op CPU threads for the CNN")
+    parser.add_argument("--metrics", action="store_true", help="time each phase and serve GET /metrics")
+    parser.add_argument("--log-requests", action="store_true", help="one JSON log line per request (with --metrics)")
+    args = parser.parse_args()
+
+    if args.log_requests:
+        logging.basicConfig(format="%(message)s")
+        logging.getLogger("Scripts.metrics").setLevel(logging.INFO)
+    metrics = Metrics(enabled=True) if args.metrics else None
+
+    print("🚀 Loading recommender...")
+    recommender = ContentBasedRecommender(metrics=metrics, cache_size=args.cache_size, cache_dir=args.cache_dir,
+                                          prefilter=not args.no_prefilter, backbone=args.backbone, backend=args.backend, threads=args.threads)
+    server = RecommendationServer(recommender, args.max_batch, args.max_wait_ms)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("👋 Server stopped")
+
+
+if __name__ == "__main__":  # python -m Scripts.server
+    main()
@@ -0,0 +1,165 @@
+import io  # Decoding from bytes
+import os  # File system
+import json  # Index format
+import argparse  # Command line
+from multiprocessing import Pool  # Decoding posters
+import numpy as np  # Pixel rows
+import pandas as pd  # Poster list
+from PIL import Image  # Decoding
+from .feature_manifest import poster_entry, stat_matches
+from .embedding_engine import INPUT_SIZE
+
+# Every catalogue poster decoded once, as a 224x224 RGB uint8 row, in one raw file
+# that extraction runs memory-map. Re-embedding with another backbone or backend
+# then reads pixels straight from the page cache instead of reopening, decoding
+# and resizing each JPEG. Normalization happens per batch (normalize_uint8).
+#
+#   Data/poster_tensors.u8    rows of 224*224*3 bytes, appended as posters arrive
+#   Data/poster_tensors.json  {"size": 224, "rows": n, "entries": {id: manifest entry + "row"}}
+#
+# The resize is exactly the one image_transform applies, so features computed from
+# the cache equal the features computed from the JPEGs. `update` only decodes
+# posters that are new or changed (same size/mtime test as the feature manifest).
+# A changed poster overwrites its own row. Rows of removed posters stay until a
+# --full rebuild.
+#
+#   python -m Scripts.tensor_cache build [--workers 8] [--full]
+
+default_tensor_path = "Data/poster_tensors.u8"
+default_metadata_path = "Data/metadata.csv"
+ROW_SHAPE = (INPUT_SIZE, INPUT_SIZE, 3)
+ROW_BYTES = INPUT_SIZE * INPUT_SIZE * 3
+SAVE_EVERY = 1024  # Rows between index saves, so an interrupted build resumes
+
+
+def index_path_for(tensor_path):
+    return os.path.splitext(tensor_path)[0] + ".json"
+
+
+def preprocess(task):
+    # Worker: (id, path) -> (id, manifest entry, uint8 row bytes) or (id, None, error)
+    movie_id, path = task
+    try:
+        with open(path, "rb") as fh:
+            data = fh.read()
+        image = Image.open(io.BytesIO(data)).convert("RGB")
+        pixels = np.asarray(image.resize((INPUT_SIZE, INPUT_SIZE), Image.BILINEAR), dtype=np.uint8)
+        return movie_id, poster_entry(path, data), pixels.tobytes()
+    except Exception as e:
+        return movie_id, None, str(e)
+
+
+class TensorCache:
+    def __init__(self, path=default_tensor_path):
+        self.path = path
+        self.index_path = index_path_for(path)
+        self.rows = 0
+        self.entries = {}  # str(movie id) -> {"path", "size", "mtime_ns", "sha1", "row"}
+        if os.path.exists(self.index_path) and os.path.exists(path):
+            with open(self.index_path, "r", encoding="utf-8") as fh:
+                index = json.load(fh)
+            if index.get("size") == INPUT_SIZE:
+                self.rows = min(index["rows"], os.path.getsize(path) // ROW_BYTES)
+                self.entries = {key: entry for key, entry in index["entries"].items() if entry["row"] < self.rows}
+
+    def save_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump({"size": INPUT_SIZE, "rows": self.rows, "entries": self.entries}, fh)
+        os.replace(tmp_path, self.index_path)
+
+    def stale(self, metadata):
+        # (id, path) of posters that are on disk but missing or outdated in the cache
+        todo = []
+        for movie_id, path in zip(metadata["id"], metadata["poster_path"]):
+            entry = self.entries.get(str(movie_id))
+            if entry is not None and stat_matches(entry, path):
+                continue
+            if os.path.exists(path):
+                todo.append((movie_id, path))
+        return todo
+
+    def update(self, metadata, workers=None, full=False):
+        # Decode new and changed posters; returns (decoded, failures)
+        if full:
+            self.rows, self.entries = 0, {}
+        todo = self.stale(metadata)
+        failures = []
+        if not todo:
+            return 0, failures
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        decoded = 0
+        with open(self.path, "r+b" if os.path.exists(self.path) and not full else "w+b") as fh, Pool(workers) as pool:
+            for movie_id, entry, result in pool.imap(preprocess, todo, chunksize=16):
+                if entry is None:
+                    failures.append((movie_id, result))
+                    continue
+                old = self.entries.get(str(movie_id))
+                row = old["row"] if old is not None else self.rows  # Changed posters keep their row
+                fh.seek(row * ROW_BYTES)
+                fh.write(result)
+                if old is None:
+                    self.rows += 1
+                self.entries[str(movie_id)] = dict(entry, row=row)
+                decoded += 1
+                if decoded % SAVE_EVERY == 0:
+                    fh.flush()
+                    self.save_index()
+                    print(f"✅ Preprocessed {decoded}/{len(todo)}")
+            fh.truncate(self.rows * ROW_BYTES)
+        self.save_index()
+        return decoded, failures
+
+    def pixels(self):
+        # Read-only (rows, 224, 224, 3) view of the whole file
+        if self.rows == 0:
+            return np.empty((0,) + ROW_SHAPE, dtype=np.uint8)
+        return np.memmap(self.path, dtype=np.uint8, mode="r", shape=(self.rows,) + ROW_SHAPE)
+
+    def fresh_entry(self, movie_id, path):
+        # Manifest entry of a cached poster that still matches the file, else None
+        entry = self.entries.get(str(movie_id))
+        if entry is None or not stat_matches(entry, path):
+            return None
+        return entry
+
+    def fresh_mask(self, metadata):
+        # True for the metadata rows whose poster can be read from the cache
+        return np.array([self.fresh_entry(movie_id, path) is not None
+                         for movie_id, path in zip(metadata["id"], metadata["poster_path"])], dtype=bool)
+
+    def batches(self, metadata, batch_size):
+        # (ids, uint8 pixels, manifest entries) per batch, in metadata order; stale posters are skipped
+        pixels = self.pixels()
+        ids, rows, entries = [], [], []
+        for movie_id, path in zip(metadata["id"], metadata["poster_path"]):
+            entry = self.fresh_entry(movie_id, path)
+            if entry is None:
+                continue
+            ids.append(movie_id)
+            rows.append(entry["row"])
+            entries.append({key: value for key, value in entry.items() if key != "row"})
+            if len(ids) == batch_size:
+                yield ids, pixels[np.array(rows)], entries
+                ids, rows, entries = [], [], []
+        if ids:
+            yield ids, pixels[np.array(rows)], entries
+
+
+if __name__ == "__main__":  # python -m Scripts.tensor_cache build
+    parser = argparse.ArgumentParser(description="Decode every poster once into a memory-mapped uint8 array")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--metadata", default=default_metadata_path)
+    parser.add_argument("--output", default=default_tensor_path)
+    parser.add_argument("--workers", type=int, default=None, help="decoding processes (default: all cores)")
+    parser.add_argument("--full", action="store_true", help="rewrite every row, dropping removed posters")
+    args = parser.parse_args()
+
+    cache = TensorCache(args.output)
+    decoded, failures = cache.update(pd.read_csv(args.metadata, usecols=["id", "poster_path"]), args.workers,
+                                     args.full)
+    for movie_id, error in failures:
+        print(f"⚠️ Error processing poster of {movie_id}: {error}")
+    size_gb = cache.rows * ROW_BYTES / 1e9
+    print(f"✅ {args.output}: {cache.rows} posters ({size_gb:.2f} GB), {decoded} decoded this run")
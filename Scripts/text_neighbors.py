@@ -0,0 +1,96 @@
+import os  # File system
+import time  # Build timing
+import hashlib  # Input fingerprint
+import numpy as np  # Numeric operations
+import pandas as pd  # Vectorized hashing
+
+# Precomputed top-K text neighbours of every movie, so recommend() is a
+# table lookup instead of a similarity scan and sort over the catalogue.
+# The table lives next to metadata.csv and carries a fingerprint of the
+# TF-IDF inputs; it is rebuilt only when those inputs change.
+
+DEFAULT_NEIGHBORS = 50  # Neighbours kept per movie
+BLOCK_CELLS = 32_000_000  # Dense similarity cells per block (~128 MB of float32)
+
+
+def neighbors_path_for(metadata_path):
+    return os.path.splitext(metadata_path)[0] + ".neighbors.npz"
+
+
+def text_fingerprint(metadata, fields, params):
+    # Hash of everything the TF-IDF matrix depends on, in row order
+    digest = hashlib.sha1(repr(params).encode("utf-8"))
+    digest.update(repr(fields).encode("utf-8"))
+    digest.update(np.asarray(metadata["id"], dtype=np.int64).tobytes())
+    columns = [column for column, _ in fields]
+    digest.update(pd.util.hash_pandas_object(metadata[columns].astype(str), index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def unit_rows(matrix):
+    # L2-normalized rows of a sparse matrix (empty rows stay empty), without importing sklearn
+    from scipy.sparse import diags  # Row scaling
+    matrix = matrix.tocsr()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return (diags((1 / norms).astype(matrix.dtype)) @ matrix).tocsr()
+
+
+def build_neighbors(tfidf_matrix, k=DEFAULT_NEIGHBORS, block_cells=BLOCK_CELLS):
+    # Blocked sparse products: each block of rows is scored against all rows, then cut to top-k
+    matrix = unit_rows(tfidf_matrix.astype(np.float32))  # Cosine = dot product of unit rows
+    n_rows = matrix.shape[0]
+    k = min(k, max(n_rows - 1, 0))
+    block_rows = max(1, block_cells // max(n_rows, 1))
+    transposed = matrix.T.tocsc()
+
+    neighbors = np.full((n_rows, k), -1, dtype=np.int32)
+    scores = np.zeros((n_rows, k), dtype=np.float32)
+    for start in range(0, n_rows, block_rows):
+        stop = min(start + block_rows, n_rows)
+        sims = (matrix[start:stop] @ transposed).toarray()
+        sims[np.arange(stop - start), np.arange(start, stop)] = -np.inf  # Never recommend the movie itself
+        if k == 0:
+            continue
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        top_sims = np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-top_sims, axis=1, kind="stable")
+        neighbors[start:stop] = np.take_along_axis(top, order, axis=1)
+        scores[start:stop] = np.take_along_axis(top_sims, order, axis=1)
+    return neighbors, scores
+
+
+def save_neighbors(path, neighbors, scores, fingerprint):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as fh:
+        np.savez(fh, neighbors=neighbors, scores=scores, fingerprint=np.array(fingerprint))
+    os.replace(tmp_path, path)
+
+
+def load_neighbors(path, fingerprint):
+    # (neighbors, scores), or None if missing or built from other inputs
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        if str(data["fingerprint"]) != fingerprint:
+            return None
+        return data["neighbors"], data["scores"]
+
+
+def load_or_build(path, fingerprint, tfidf_matrix, k=DEFAULT_NEIGHBORS):
+    table = load_neighbors(path, fingerprint)
+    if table is not None and table[0].shape[0] == tfidf_matrix.shape[0]:
+        return table
+
+    start = time.perf_counter()
+    neighbors, scores = build_neighbors(tfidf_matrix, k)
+    save_neighbors(path, neighbors, scores, fingerprint)
+    print(f"🧮 Text neighbour table built for {len(neighbors)} movies "
+          f"({time.perf_counter() - start:.1f}s) -> {path}")
+    return neighbors, scores
+
+
+if __name__ == "__main__":  # python -m Scripts.text_neighbors: prebuild the table offline
+    from .recommender import ContentBasedRecommender
+    recommender = ContentBasedRecommender()
+    print(f"✅ {recommender.neighbors_path}: {recommender.neighbors.shape[1]} neighbours per movie")
@@ -0,0 +1,91 @@
+import os  # File system
+import time  # Startup timing
+import argparse  # Command line
+import tempfile  # Scratch cache for the cold start
+import numpy as np  # Numeric operations
+
+# Fitted TF-IDF vocabularies and the combined weighted matrix, persisted
+# next to metadata.csv so the recommender loads them instead of refitting
+# five vectorizers on every start. Keyed on the text fingerprint.
+# A warm start only reads arrays; sklearn is imported only to fit.
+
+
+def tfidf_path_for(metadata_path):
+    return os.path.splitext(metadata_path)[0] + ".tfidf.npz"
+
+
+def fit_text_features(metadata, fields, params):
+    # One vectorizer per field, weighted blocks stacked side by side
+    from sklearn.feature_extraction.text import TfidfVectorizer  # Text features
+    from scipy.sparse import hstack  # Side-by-side blocks
+    vectorizers, blocks = {}, []
+    for field, weight in fields:
+        vectorizer = TfidfVectorizer(**params)
+        blocks.append(vectorizer.fit_transform(metadata[field]) * weight)
+        vectorizers[field] = vectorizer
+    return hstack(blocks).tocsr(), vectorizers
+
+
+def vocabularies_of(vectorizers):
+    # field -> (terms, idf) of fitted vectorizers
+    return {field: (vectorizer.get_feature_names_out().astype(str), vectorizer.idf_)
+            for field, vectorizer in vectorizers.items()}
+
+
+def save_tfidf(path, matrix, vocabularies, fingerprint):
+    arrays = {"data": matrix.data, "indices": matrix.indices, "indptr": matrix.indptr,
+              "shape": np.array(matrix.shape), "fingerprint": np.array(fingerprint),
+              "fields": np.array(list(vocabularies))}
+    for field, (terms, idf) in vocabularies.items():
+        arrays[f"vocab_{field}"] = terms
+        arrays[f"idf_{field}"] = idf
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as fh:
+        np.savez(fh, **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_tfidf(path, fingerprint):
+    # (matrix, vocabularies), or None if missing or fitted on other inputs
+    if not os.path.exists(path):
+        return None
+    from scipy.sparse import csr_matrix  # Stored matrix
+    with np.load(path) as data:
+        if str(data["fingerprint"]) != fingerprint:
+            return None
+        matrix = csr_matrix((data["data"], data["indices"], data["indptr"]), shape=tuple(data["shape"]))
+        vocabularies = {str(field): (data[f"vocab_{field}"], data[f"idf_{field}"]) for field in data["fields"]}
+    return matrix, vocabularies
+
+
+def load_or_fit(path, fingerprint, metadata, fields, params):
+    # (matrix, vocabularies); params are part of the fingerprint
+    cached = load_tfidf(path, fingerprint)
+    if cached is not None and cached[0].shape[0] == len(metadata):
+        return cached
+    matrix, vectorizers = fit_text_features(metadata, fields, params)
+    vocabularies = vocabularies_of(vectorizers)
+    save_tfidf(path, matrix, vocabularies, fingerprint)
+    return matrix, vocabularies
+
+
+if __name__ == "__main__":  # python -m Scripts.tfidf_cache: cold vs warm TF-IDF time
+    from .recommender import TEXT_FIELDS, TFIDF_PARAMS, default_metadata_path
+    from .metadata_store import load_metadata
+    from .text_neighbors import text_fingerprint
+
+    parser = argparse.ArgumentParser(description="Compare TF-IDF preparation with and without the cache")
+    parser.add_argument("--metadata", default=default_metadata_path, help="metadata CSV")
+    args = parser.parse_args()
+
+    # The same rows the recommender vectorizes
+    metadata = load_metadata(args.metadata).dropna(subset=[field for field, _ in TEXT_FIELDS])
+    metadata = metadata.reset_index(drop=True)
+    fingerprint = text_fingerprint(metadata, TEXT_FIELDS, TFIDF_PARAMS)
+    with tempfile.TemporaryDirectory() as workdir:  # The cache next to the metadata is never touched
+        cache_path = os.path.join(workdir, os.path.basename(tfidf_path_for(args.metadata)))
+        for label in ("cold", "warm"):  # Cold fits and writes the scratch cache, warm reads it
+            start = time.perf_counter()
+            matrix, _ = load_or_fit(cache_path, fingerprint, metadata, TEXT_FIELDS, TFIDF_PARAMS)
+            print(f"⏱️ {label}: TF-IDF {time.perf_counter() - start:.3f}s "
+                  f"({matrix.shape[0]} movies x {matrix.shape[1]} terms)")
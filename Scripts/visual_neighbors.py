@@ -0,0 +1,71 @@
+import os  # File system
+import time  # Build timing
+import numpy as np  # Numeric operations
+
+# Precomputed top-K poster neighbours of every stored vector, so the visual half
+# of a hybrid recommend() is a table lookup like the text half, not a scan of
+# features.emb. Rows are store rows. The table is built with the recommender's
+# search index (exact, IVF or compressed), one block of queries at a time, and
+# lives next to the store keyed on its fingerprint, so it is rebuilt only after
+# a new extraction.
+
+BLOCK_ROWS = 1024  # Queries per search call while building
+
+
+def visual_neighbors_path_for(store_path):
+    return os.path.splitext(store_path)[0] + ".neighbors.npz"
+
+
+def build_neighbors(features, index, k, block_rows=BLOCK_ROWS):
+    # (n, k) neighbour rows (-1 padded) and scores, the row itself left out
+    n_rows = len(features)
+    k = min(k, max(n_rows - 1, 0))
+    neighbors = np.full((n_rows, k), -1, dtype=np.int32)
+    scores = np.zeros((n_rows, k), dtype=np.float32)
+    if k == 0:
+        return neighbors, scores
+    for start in range(0, n_rows, block_rows):
+        stop = min(start + block_rows, n_rows)
+        rows, sims = index.search(np.asarray(features[start:stop], dtype=np.float32), k + 1)
+        for i, (found, found_sims) in enumerate(zip(rows, sims)):
+            keep = found != start + i  # Never recommend the movie itself
+            found, found_sims = found[keep][:k], found_sims[keep][:k]
+            neighbors[start + i, :len(found)] = found
+            scores[start + i, :len(found)] = found_sims
+    return neighbors, scores
+
+
+def save_neighbors(path, neighbors, scores, fingerprint):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as fh:
+        np.savez(fh, neighbors=neighbors, scores=scores, fingerprint=np.array(fingerprint))
+    os.replace(tmp_path, path)
+
+
+def load_neighbors(path, fingerprint, k):
+    # (neighbors, scores), or None if missing, built for another store or narrower than k
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        if str(data["fingerprint"]) != fingerprint or data["neighbors"].shape[1] < k:
+            return None
+        return data["neighbors"][:, :k], data["scores"][:, :k]
+
+
+def load_or_build(path, store, features, index, k):
+    table = load_neighbors(path, store.fingerprint, min(k, max(len(features) - 1, 0)))
+    if table is not None and table[0].shape[0] == len(features):
+        return table
+
+    start = time.perf_counter()
+    neighbors, scores = build_neighbors(features, index, k)
+    save_neighbors(path, neighbors, scores, store.fingerprint)
+    print(f"🧮 Visual neighbour table built for {len(neighbors)} posters "
+          f"({time.perf_counter() - start:.1f}s) -> {path}")
+    return neighbors, scores
+
+
+if __name__ == "__main__":  # python -m Scripts.visual_neighbors: prebuild the table offline
+    from .recommender import ContentBasedRecommender
+    recommender = ContentBasedRecommender(lazy_model=True)
+    print(f"✅ {recommender.visual_neighbors_path}: {recommender.visual_neighbors.shape[1]} neighbours per poster")
@@ -1,81 +1,133 @@
 import os
+import argparse
+import numpy as np
 import pandas as pd
+from Scripts.metadata_store import columnar_path_for, write_columnar
 
 # === 1. Paths and constants ===
 RAW_DIR = "Data/Raw"
 POSTER_DIR = "Data/Posters"
+POSTER_PATH_DIR = "data/posters"  # Prefix written to the poster_path column
 OUTPUT_FILE = "Data/metadata.csv"
 LIMIT = 500  # maximum number of movies
 
-# === 2. Load CSV files ===
-print("📄 Loading CSV files...")
-movies = pd.read_csv(os.path.join(RAW_DIR, "movies.csv"))      # id, name, date, minute, description, rating
-genres = pd.read_csv(os.path.join(RAW_DIR, "genres.csv"))      # id, genre
-actors = pd.read_csv(os.path.join(RAW_DIR, "actors.csv"))      # id, actor
-studios = pd.read_csv(os.path.join(RAW_DIR, "studios.csv"))    # id, studio
-directors = pd.read_csv(os.path.join(RAW_DIR, "directors.csv"))  # id, name
-
-# === 3. Group genres per movie ===
-print("🎭 Grouping genres by movie...")
-genres_grouped = genres.groupby("id")["genre"] \
-    .apply(lambda g: "|".join(sorted(set(g)))) \
-    .reset_index() \
-    .rename(columns={"id": "id", "genre": "genres"})
-
-# === 4. Group cast per movie ===
-print("🎬 Grouping cast by movie...")
-actors_grouped = actors.groupby("id")["name"] \
-    .apply(lambda a: ", ".join(a.dropna().astype(str))) \
-    .reset_index() \
-    .rename(columns={"name": "cast"})
-
-# === 5. Group studios per movie ===
-print("🏢 Grouping studios by movie...")
-studios_grouped = studios.groupby("id")["studio"] \
-    .apply(lambda s: "|".join(sorted(set(s.dropna().astype(str))))) \
-    .reset_index() \
-    .rename(columns={"id": "id", "studio": "studio"})
-
-# === 6. Group director per movie ===
-print("🎥 Grouping directors by movie...")
-directors_grouped = directors.groupby("id")["name"] \
-    .apply(lambda d: ", ".join(d.dropna().astype(str))) \
-    .reset_index() \
-    .rename(columns={"name": "director"})
-
-# === 7. Prepare main movie DataFrame ===
-print("📊 Preparing main movie DataFrame...")
-df = movies.rename(columns={
-    "id": "id",
-    "name": "title",
-    "date": "year",
-    "minute": "duration",
-    "description": "description",
-    "rating": "rating"
-})[["id", "title", "year", "duration", "description", "rating"]]
-
-# === 8. Merge genres, cast, studios and director ===
-print("🔗 Merging movie details (genres, cast, studio, director)...")
-df = df.merge(genres_grouped, on="id", how="left")
-df = df.merge(actors_grouped, on="id", how="left")
-df = df.merge(studios_grouped, on="id", how="left")
-df = df.merge(directors_grouped, on="id", how="left")
-
-# === 9. Add column with poster path ===
-print("🖼️ Adding poster path column...")
-df["poster_path"] = df["id"].apply(lambda i: os.path.join("data/posters", f"{i}.jpg"))
-
-# === 10. Filter: include only movies with an existing poster ===
-print("🔍 Filtering movies with missing posters...")
-df = df[df["poster_path"].apply(os.path.exists)]
-
-# === 11. Limit to the first N movies ===
-print(f"⏳ Limiting to the first {LIMIT} movies...")
-df = df.head(LIMIT)
-
-# === 12. Save final metadata file ===
-print(f"💾 Saving final metadata file to '{OUTPUT_FILE}'...")
-os.makedirs("data", exist_ok=True)
-df.to_csv(OUTPUT_FILE, index=False)
-
-print(f"✅ metadata.csv successfully created: {len(df)} movies included.")
+# Columns read from each raw file (everything else is skipped by the parser)
+MOVIE_COLUMNS = {"id": "id", "name": "title", "date": "year", "minute": "duration",
+                 "description": "description", "rating": "rating"}
+NUMERIC_COLUMNS = ["date", "minute", "rating"]  # dtype as a whole-file read infers it
+ID_DTYPE = "int64"
+
+
+def read_table(name, columns, dtype, chunksize=None):
+    # Needed columns only, with explicit dtypes; a list of one frame or a chunk iterator
+    path = os.path.join(RAW_DIR, name)
+    if chunksize:
+        return pd.read_csv(path, usecols=columns, dtype=dtype, chunksize=chunksize)
+    return [pd.read_csv(path, usecols=columns, dtype=dtype)]
+
+
+def numeric_dtypes(chunksize=None):
+    # Year/duration/rating are written as read (e.g. 2019.0 when any year is missing),
+    # so chunks must use the dtype the whole column would get, not their own guess
+    if not chunksize:
+        return {}
+    dtypes = {}
+    for chunk in read_table("movies.csv", NUMERIC_COLUMNS, None, chunksize):
+        for column in NUMERIC_COLUMNS:
+            kind = chunk[column].dtype
+            if column in dtypes:
+                kind = np.dtype(object) if object in (kind, dtypes[column]) else np.result_type(kind, dtypes[column])
+            dtypes[column] = kind
+    return {column: (str if kind == object else kind) for column, kind in dtypes.items()}
+
+
+def poster_names():
+    # One directory listing instead of an os.path.exists per movie
+    if not os.path.isdir(POSTER_DIR):
+        return set()
+    return {os.path.normcase(name) for name in os.listdir(POSTER_DIR)}
+
+
+def select_movies(limit=LIMIT, chunksize=None):
+    # First `limit` movies, in file order, that have a poster on disk
+    posters = poster_names()
+    dtype = {"id": ID_DTYPE, "name": str, "description": str, **numeric_dtypes(chunksize)}
+    selected, count = [], 0
+    for chunk in read_table("movies.csv", list(MOVIE_COLUMNS), dtype, chunksize):
+        names = chunk["id"].astype(str) + ".jpg"
+        if os.path.normcase("A") == "a":  # Case-insensitive file system
+            names = names.str.lower()
+        chunk = chunk[names.isin(posters)]
+        if limit is not None:
+            chunk = chunk.head(limit - count)
+        selected.append(chunk)
+        count += len(chunk)
+        if limit is not None and count >= limit:
+            break
+    movies = pd.concat(selected, ignore_index=True)
+    return movies.rename(columns=MOVIE_COLUMNS)[list(MOVIE_COLUMNS.values())]
+
+
+def group_values(name, column, ids, sep, unique_sorted=False, chunksize=None):
+    # Rows of the selected movies only, joined per movie in one groupby pass
+    frames = [chunk[chunk["id"].isin(ids)]
+              for chunk in read_table(name, ["id", column], {"id": ID_DTYPE, column: str}, chunksize)]
+    values = pd.concat(frames, ignore_index=True).dropna(subset=[column])
+    if unique_sorted:  # "|".join(sorted(set(...)))
+        values = values.drop_duplicates().sort_values(["id", column], kind="stable")
+    return values.groupby("id")[column].agg(sep.join)  # File order kept within each movie
+
+
+def build_metadata(limit=LIMIT, chunksize=None):
+    # === 2. Select movies with a poster (LIMIT applied before any join) ===
+    print("📄 Loading movies and filtering missing posters...")
+    df = select_movies(limit, chunksize)
+    ids = df["id"].unique()
+
+    # === 3. Group genres, cast, studios and directors of those movies ===
+    print("🎭 Grouping genres, cast, studios and directors by movie...")
+    grouped = {
+        "genres": group_values("genres.csv", "genre", ids, "|", unique_sorted=True, chunksize=chunksize),
+        "cast": group_values("actors.csv", "name", ids, ", ", chunksize=chunksize),
+        "studio": group_values("studios.csv", "studio", ids, "|", unique_sorted=True, chunksize=chunksize),
+        "director": group_values("directors.csv", "name", ids, ", ", chunksize=chunksize),
+    }
+
+    # === 4. Merge genres, cast, studios and director ===
+    print("🔗 Merging movie details (genres, cast, studio, director)...")
+    for column, values in grouped.items():
+        df[column] = df["id"].map(values)
+
+    # === 5. Add column with poster path ===
+    df["poster_path"] = [os.path.join(POSTER_PATH_DIR, f"{i}.jpg") for i in df["id"]]
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge the raw CSV files into metadata.csv")
+    parser.add_argument("--limit", type=int, default=LIMIT, help="maximum number of movies (0 = all)")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="rows per read; bounds memory on catalogue-scale raw files")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--columnar", action=argparse.BooleanOptionalAction, default=True,
+                        help="also write the Parquet copy the recommender loads (default: on)")
+    args = parser.parse_args()
+
+    df = build_metadata(args.limit or None, args.chunksize)
+
+    # === 6. Save final metadata file ===
+    print(f"💾 Saving final metadata file to '{args.output}'...")
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    df.to_csv(args.output, index=False)
+
+    print(f"✅ metadata.csv successfully created: {len(df)} movies included.")
+
+    # === 7. Parquet copy, loaded by the recommender instead of the CSV ===
+    if args.columnar:
+        path = columnar_path_for(args.output)
+        write_columnar(pd.read_csv(args.output), path)  # Same values and dtypes as a CSV read
+        print(f"🗂️ Parquet copy written to '{path}'")
+
+
+if __name__ == "__main__":
+    main()
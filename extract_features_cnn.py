@@ -1,63 +1,249 @@
 import os
+import io
+import time
+import argparse
+import itertools
 import numpy as np
 import pandas as pd
 from PIL import Image
 import torch
-import torchvision.transforms as transforms
-import torchvision.models as models
+from torch.utils.data import Dataset, DataLoader
+from Scripts.embedding_engine import (EmbeddingEngine, image_transform, normalize_uint8, BACKBONES, BACKENDS,
+                                      DEFAULT_BACKBONE, DEFAULT_BACKEND)
+from Scripts.feature_manifest import (poster_entry, stat_matches, load_manifest, save_manifest,
+                                      plan_update, write_chunk, load_chunks, clear_chunks,
+                                      start_full_rebuild, full_rebuild_pending)
+from Scripts.embedding_store import EmbeddingStore, write_store
+from Scripts.feature_shards import parse_shard, shard_mask, fragment_paths, default_shard_dir
+from Scripts.tensor_cache import TensorCache
 
 # === Config ===
 metadata_path = "Data/metadata.csv"
-features_out = "features.npy"
-ids_out = "ids.npy"
+store_out = "features.emb"  # Single mmap-able file: header, vectors and id index
+manifest_out = "features_manifest.json"  # id -> poster size/mtime/hash of stored vectors
+checkpoint_dir = "features_checkpoint"   # Chunks of an unfinished run
+BATCH_SIZE = 32   # Posters per forward pass
+NUM_WORKERS = 4   # Background processes decoding JPEGs
+CHECKPOINT_EVERY = 1024  # Posters per checkpoint chunk
+MISSING = "missing"  # Marker for posters that are not on disk
 
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+# === Transformations ===
+transform = image_transform()  # Same preprocessing as the recommender
 
-# === Model Setup ===
-model = models.resnet50(weights=models.ResNet50_Weights.DEFAULT)
-model = torch.nn.Sequential(*list(model.children())[:-1])  # remove classifier
-model.eval().to(device)
 
-# === Transformations ===
-transform = transforms.Compose([
-    transforms.Resize((224, 224)),
-    transforms.ToTensor(),
-    transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                         std=[0.229, 0.224, 0.225])
-])
-
-# === Load metadata ===
-metadata = pd.read_csv(metadata_path)
-features = []
-ids = []
-
-print("🚀 Extracting features using ResNet50...")
-
-for idx, row in metadata.iterrows():
-    image_path = row["poster_path"]
-    if not os.path.exists(image_path):
-        print(f"❌ Missing: {image_path}")
-        continue
+# === Dataset ===
+class PosterDataset(Dataset):
+    def __init__(self, metadata):
+        self.ids = metadata["id"].tolist()
+        self.paths = metadata["poster_path"].tolist()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        # Decoding and hashing happen in the worker; failures are returned, not raised
+        image_path = self.paths[index]
+        if not os.path.exists(image_path):
+            return None, self.ids[index], image_path, None, MISSING
+
+        try:
+            with open(image_path, "rb") as fh:
+                data = fh.read()
+            image = Image.open(io.BytesIO(data)).convert("RGB")
+            return transform(image), self.ids[index], image_path, poster_entry(image_path, data), None
+        except Exception as e:
+            return None, self.ids[index], image_path, None, str(e)
+
+
+def collate_posters(batch):
+    # Stack decoded posters, keep failed ones aside for reporting
+    tensors, ids, entries, failures = [], [], [], []
+    for tensor, movie_id, image_path, entry, error in batch:
+        if error is None:
+            tensors.append(tensor)
+            ids.append(movie_id)
+            entries.append(entry)
+        else:
+            failures.append((image_path, error))
+
+    images = torch.stack(tensors) if tensors else None
+    return images, ids, entries, failures
+
+
+def cached_batches(tensor_cache, metadata, batch_size, device):
+    # Same batches as the DataLoader, read from the tensor cache without decoding any JPEG
+    for ids, pixels, entries in tensor_cache.batches(metadata, batch_size):
+        yield normalize_uint8(pixels, device), ids, entries, []
+
+
+# === Extraction ===
+def iter_features(metadata, engine, batch_size=BATCH_SIZE, num_workers=NUM_WORKERS, tensor_cache=None):
+    # Yield (ids, features, manifest entries) batch by batch
+    engine.load()
+    total = len(metadata)
+    sources = []
+    if tensor_cache is not None:  # Cached posters first, the DataLoader decodes the rest
+        cached = tensor_cache.fresh_mask(metadata)
+        sources.append(cached_batches(tensor_cache, metadata[cached], batch_size, engine.device))
+        metadata = metadata[~cached]
+        print(f"🗜️ {int(cached.sum())} posters from the tensor cache, {len(metadata)} to decode")
+    if len(metadata):
+        sources.append(DataLoader(PosterDataset(metadata), batch_size=batch_size,
+                                  num_workers=num_workers, collate_fn=collate_posters,
+                                  pin_memory=engine.device.type == "cuda"))
+    loader = itertools.chain(*sources)
+
+    embedded = 0
+    seen = 0
+    start = time.perf_counter()
+
+    for images, batch_ids, entries, failures in loader:
+        for image_path, error in failures:
+            if error == MISSING:
+                print(f"❌ Missing: {image_path}")
+            else:
+                print(f"⚠️ Error processing {image_path}: {error}")
+
+        if images is not None:
+            batch_features = engine.forward(images)
+            embedded += len(batch_ids)
+            yield batch_ids, batch_features, entries
 
+        seen += len(batch_ids) + len(failures)
+        print(f"✅ Processed {seen}/{total}")
+
+    elapsed = time.perf_counter() - start
+    rate = embedded / elapsed if elapsed > 0 else 0.0
+    print(f"⚡ Embedded {embedded} posters in {elapsed:.1f}s ({rate:.1f} images/s)")
+
+
+def load_stored(engine):
+    if not os.path.exists(store_out):
+        return np.empty(0, dtype=np.int64), None
+    store = EmbeddingStore(store_out)
+    if store.model_id != engine.engine_id or store.dim != engine.dim:
+        print(f"⚠️ {store_out} was built with '{store.model_id}' ({store.dim}-d), re-embedding everything")
+        return np.empty(0, dtype=np.int64), None
+    return np.asarray(store.ids), store.features
+
+
+def update_features(metadata, engine, batch_size=BATCH_SIZE, num_workers=NUM_WORKERS,
+                    checkpoint_every=CHECKPOINT_EVERY, full=False, checkpoint=checkpoint_dir, shard=None,
+                    tensor_cache=None):
+    # With a shard, metadata is already that shard's movies; the merged store is still reused
+    if full:
+        start_full_rebuild(checkpoint)  # Cleared by main once the new store is written
+    elif full_rebuild_pending(checkpoint):  # The old store and manifest must not be reused
+        print("♻️ Resuming an interrupted --full rebuild")
+        full = True
+    manifest = {} if full else load_manifest(manifest_out)
+    stored_ids, stored_features = (np.empty(0, dtype=np.int64), None) if full else load_stored(engine)
+    in_shard = shard_mask(stored_ids, shard) if shard else slice(None)
+    keep, todo, removed = plan_update(metadata, manifest, stored_ids[in_shard])
+
+    # Posters already embedded by an interrupted run are not embedded again
+    resumed = set()
+    for chunk_ids, _, entries in load_chunks(checkpoint, engine.engine_id):
+        for movie_id, entry in zip(chunk_ids, entries):
+            if stat_matches(entry, entry["path"]):
+                resumed.add(str(movie_id))
+    todo = [movie_id for movie_id in todo if str(movie_id) not in resumed]
+
+    print(f"♻️ Reusing {len(keep)} stored, {len(resumed)} checkpointed; "
+          f"embedding {len(todo)}, dropping {len(removed)} removed")
+
+    # === Embed new or changed posters, checkpointing every chunk ===
+    pending_ids, pending_features, pending_entries = [], [], []
+    pending = 0
+    for batch_ids, batch_features, entries in iter_features(metadata[metadata["id"].isin(todo)], engine,
+                                                             batch_size, num_workers, tensor_cache):
+        pending_ids.extend(batch_ids)
+        pending_features.append(batch_features)
+        pending_entries.extend(entries)
+        pending += len(batch_ids)
+        if pending >= checkpoint_every:
+            write_chunk(checkpoint, pending_ids, np.concatenate(pending_features), pending_entries,
+                        engine.engine_id)
+            pending_ids, pending_features, pending_entries = [], [], []
+            pending = 0
+    if pending:
+        write_chunk(checkpoint, pending_ids, np.concatenate(pending_features), pending_entries,
+                        engine.engine_id)
+
+    # === Merge stored and new vectors in metadata order ===
+    stored_rows = {str(movie_id): row for row, movie_id in enumerate(stored_ids)}
+    new_vectors = {}
+    for chunk_ids, chunk_features, entries in load_chunks(checkpoint, engine.engine_id):
+        for movie_id, feature, entry in zip(chunk_ids, chunk_features, entries):
+            new_vectors[str(movie_id)] = (feature, entry)
+
+    ids, vectors, new_manifest = [], [], {}
+    for movie_id in metadata["id"]:
+        key = str(movie_id)
+        if key in new_vectors:
+            feature, entry = new_vectors[key]
+        elif key in keep:
+            feature, entry = stored_features[stored_rows[key]], keep[key]
+        else:
+            continue  # Missing or unreadable poster
+        ids.append(movie_id)
+        vectors.append(feature)
+        new_manifest[key] = entry
+
+    features = np.stack(vectors).astype(np.float32) if vectors else np.empty((0, engine.dim), dtype=np.float32)
+    return features, np.array(ids, dtype=np.int64), new_manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract CNN poster embeddings")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="posters per forward pass")
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS, help="poster decoding processes (0 = main process)")
+    parser.add_argument("--checkpoint-every", type=int, default=CHECKPOINT_EVERY, help="posters per checkpoint chunk")
+    parser.add_argument("--full", action="store_true", help="ignore the manifest and re-embed every poster")
+    parser.add_argument("--backbone", choices=list(BACKBONES), default=DEFAULT_BACKBONE)
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND,
+                        help="eager, torchscript, compile, int8 (quantized, CPU) or onnx (needs onnxruntime)")
+    parser.add_argument("--threads", type=int, default=None, help="intra-op CPU threads")
+    parser.add_argument("--shard", default=None,
+                        help=f"i/N: embed only ids with id %% N == i into {default_shard_dir}/, "
+                             f"then run 'python -m Scripts.feature_shards merge'")
+    parser.add_argument("--tensor-cache", action="store_true",
+                        help="read posters from the preprocessed uint8 cache, updating it first (read-only with --shard)")
+    args = parser.parse_args()
     try:
-        image = Image.open(image_path).convert("RGB")
-        image = transform(image).unsqueeze(0).to(device)
+        shard = parse_shard(args.shard) if args.shard else None
+    except ValueError as e:
+        parser.error(str(e))
+    engine = EmbeddingEngine(args.backbone, args.backend, args.threads)
+
+    # === Load metadata ===
+    metadata = pd.read_csv(metadata_path)
+    store_path, manifest_path, checkpoint = store_out, manifest_out, checkpoint_dir
+    if shard:  # This worker's movies only, written as a fragment
+        metadata = metadata[shard_mask(metadata["id"], shard)]
+        store_path, manifest_path, checkpoint = fragment_paths(shard)
+        os.makedirs(default_shard_dir, exist_ok=True)
+        print(f"🧩 Shard {shard[0]}/{shard[1]}: {len(metadata)} movies")
 
-        with torch.no_grad():
-            feature = model(image).squeeze().cpu().numpy()
+    tensor_cache = None
+    if args.tensor_cache:
+        tensor_cache = TensorCache()
+        if not shard:  # Shards share the file, so only an unsharded run writes to it
+            decoded, _ = tensor_cache.update(metadata, max(args.workers, 1))
+            print(f"🗜️ Tensor cache: {tensor_cache.rows} posters, {decoded} new or changed decoded")
 
-        features.append(feature)
-        ids.append(row["id"])
+    print(f"🚀 Extracting features using {engine.describe()} (batch {args.batch_size}, {args.workers} workers)...")
+    features, ids, manifest = update_features(metadata, engine, args.batch_size, args.workers,
+                                              args.checkpoint_every, args.full, checkpoint, shard, tensor_cache)
 
-        if idx % 25 == 0:
-            print(f"✅ Processed {idx+1}/{len(metadata)}")
+    # === Save features ===
+    write_store(store_path, ids, features, engine.engine_id)
+    save_manifest(manifest, manifest_path)
+    clear_chunks(checkpoint)  # Only once the merged files are safely on disk
+    print("✅ Feature extraction complete. Files saved:")
+    print(f"  - {store_path}")
+    print(f"  - {manifest_path}")
 
-    except Exception as e:
-        print(f"⚠️ Error processing {image_path}: {e}")
 
-# === Save features ===
-np.save(features_out, np.array(features))
-np.save(ids_out, np.array(ids))
-print("✅ Feature extraction complete. Files saved:")
-print(f"  - {features_out}")
-print(f"  - {ids_out}")
+if __name__ == "__main__":  # Required for DataLoader workers on Windows
+    main()